@@ -0,0 +1,219 @@
+"""
+asyncio facade over the sql.py data layer.
+
+    import aio
+
+    async with aio.Database(readers=4) as db:
+        task_id = await db.tasks.create(1, "Extract Soap", "2025-01-31", "Open")
+        async for task in db.tasks.iter(status="Open"):
+            ...
+
+Writes run on one dedicated writer thread (SQLite allows a single writer at a
+time anyway) and reads on a pool of reader threads; each thread keeps its own
+sql.py connection. The event loop never blocks on disk. At most max_pending
+operations are queued at once; further callers wait, which gives backpressure.
+Cancelling an awaiting caller drops a queued operation, and interrupts a read
+that is already running. Database errors are raised as sqlite3.Error instead of
+being printed.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import sql
+
+
+class _Call:
+    """
+    One operation handed to a worker thread. Remembers the connection it runs on
+    so that a cancelled read can be interrupted while, and only while, it runs.
+    """
+
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.conn = sql.get_connection()
+        try:
+            with sql.raise_errors():
+                return self.function(*self.args, **self.kwargs)
+        finally:
+            with self.lock:
+                self.conn = None
+
+    def interrupt(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.interrupt()
+
+
+def _close_connections(executor, workers):
+    """
+    Close the sql.py connection of each of an executor's worker threads, leaving
+    other threads' connections open.
+    """
+    barrier = threading.Barrier(workers)
+
+    def close():
+        sql.close_connection()
+        barrier.wait()  # hold this thread, so that each call runs on a different worker
+
+    for future in [executor.submit(close) for _ in range(workers)]:
+        future.result()
+
+
+class Database:
+    """
+    Async entry point: db.users, db.details, db.tasks and db.tags mirror sql.py.
+
+    Parameters:
+    readers (int): Number of reader threads.
+    max_pending (int): Maximum number of operations queued or running at once.
+    db_path (str): Database file; passed to sql.configure() when given.
+    """
+
+    def __init__(self, readers=4, max_pending=256, db_path=None):
+        if db_path is not None:
+            sql.configure(db_path)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='taskforce141-writer')
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='taskforce141-reader')
+        self._reader_count = readers
+        self._slots = asyncio.Semaphore(max_pending)
+        self.users = Users(self)
+        self.details = UserDetails(self)
+        self.tasks = Tasks(self)
+        self.tags = Tags(self)
+
+    async def run(self, function, *args, write=False, **kwargs):
+        """
+        Run function(*args, **kwargs) on the writer thread (write=True) or the reader pool.
+        """
+        call = _Call(function, args, kwargs)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._writer if write else self._readers, call)
+            try:
+                return await future
+            except asyncio.CancelledError:
+                # A queued call is dropped by cancelling its future; a running read is
+                # interrupted. A running write is left to finish so it is never half-known.
+                if not write:
+                    call.interrupt()
+                raise
+
+    async def close(self):
+        """
+        Wait for running operations, stop the worker threads and close their connections.
+        """
+        loop = asyncio.get_running_loop()
+        for executor, workers in ((self._writer, 1), (self._readers, self._reader_count)):
+            await loop.run_in_executor(None, partial(_close_connections, executor, workers))
+            await loop.run_in_executor(None, partial(executor.shutdown, wait=True))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+def _operation(name, write=False):
+    """
+    Build an async method that runs sql.<name> on the writer thread or reader pool.
+    The function is looked up on each call, so instrumentation such as profiling.enable() applies.
+    """
+    async def method(self, *args, **kwargs):
+        return await self._db.run(getattr(sql, name), *args, write=write, **kwargs)
+    method.__name__ = name
+    method.__doc__ = f"Run sql.{name}() on the {'writer thread' if write else 'reader pool'}."
+    return method
+
+
+class _Namespace:
+    def __init__(self, db):
+        self._db = db
+
+    async def _iter_pages(self, read_page, page_size, after_id, **kwargs):
+        """
+        Yield rows page by page using keyset pagination on the first column. The next
+        page is only fetched once the consumer has taken every row of the current one.
+        """
+        while True:
+            page = await self._db.run(read_page, after_id=after_id, limit=page_size, **kwargs)
+            for row in page:
+                yield row
+            if len(page) < page_size:
+                return
+            after_id = page[-1][0]
+
+
+class Users(_Namespace):
+    create = _operation('create_user', write=True)
+    create_bulk = _operation('create_users_bulk', write=True)
+    get = _operation('read_user')
+    page = _operation('read_users_page')
+    update = _operation('update_user', write=True)
+    delete = _operation('delete_user', write=True)
+
+    def iter(self, page_size=sql.PAGE_SIZE, after_id=0):
+        """Yield every user in user_id order, one page per query."""
+        return self._iter_pages(lambda **kw: sql.read_users_page(**kw), page_size, after_id)
+
+
+class UserDetails(_Namespace):
+    create = _operation('create_user_details', write=True)
+    create_bulk = _operation('create_users_details_bulk', write=True)
+    get = _operation('read_user_details')
+    page = _operation('read_users_details_page')
+    update = _operation('update_user_details', write=True)
+    delete = _operation('delete_user_details', write=True)
+
+    def iter(self, page_size=sql.PAGE_SIZE, after_id=0):
+        """Yield every user details row in user_id order, one page per query."""
+        return self._iter_pages(lambda **kw: sql.read_users_details_page(**kw), page_size, after_id)
+
+
+class Tasks(_Namespace):
+    create = _operation('create_task', write=True)
+    create_bulk = _operation('create_tasks_bulk', write=True)
+    get = _operation('read_task')
+    page = _operation('read_tasks_page')
+    query = _operation('query_tasks')
+    search = _operation('search_tasks')
+    update = _operation('update_task', write=True)
+    delete = _operation('delete_task', write=True)
+    complete = _operation('mark_task_as_complete', write=True)
+    for_tag = _operation('read_tasks_details_for_tag')
+
+    def iter(self, page_size=sql.PAGE_SIZE, after_id=0, **filters):
+        """
+        Yield tasks in task_id order, one page per query. Keyword filters are those
+        of sql.query_tasks() (user_id, status, due_before, due_after, tag_ids).
+        """
+        return self._iter_pages(lambda **kw: sql.query_tasks(**kw), page_size, after_id, **filters)
+
+
+class Tags(_Namespace):
+    create = _operation('create_tag', write=True)
+    create_bulk = _operation('create_tags_bulk', write=True)
+    get = _operation('read_tag')
+    page = _operation('read_tags_page')
+    update = _operation('update_tag', write=True)
+    delete = _operation('delete_tag', write=True)
+    for_task = _operation('read_tags_details_for_task')
+    assign = _operation('create_task_tag_relation', write=True)
+    assign_bulk = _operation('create_task_tag_relations_bulk', write=True)
+    unassign = _operation('remove_tag_from_task', write=True)
+    tag_tasks = _operation('tag_tasks', write=True)
+    untag_tasks = _operation('untag_tasks', write=True)
+
+    def iter(self, page_size=sql.PAGE_SIZE, after_id=0):
+        """Yield every tag in tag_id order, one page per query."""
+        return self._iter_pages(lambda **kw: sql.read_tags_page(**kw), page_size, after_id)
@@ -0,0 +1,260 @@
+"""
+Time the public sql.py functions against a generated database and save the results as JSON.
+
+Usage:
+    python generate_data.py --scale 10k
+    python benchmark.py --db bench_10k.db --output results.json
+    python benchmark.py --db bench_10k.db --baseline results.json
+
+The database is copied to a temporary directory first, so write benchmarks never
+change it. Each case is run --repeat times with random existing IDs; the lookup
+cache is disabled unless --cache is given, so the numbers reflect SQLite work.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import create_db
+import sql
+from profiling import data_functions
+
+
+class Context:
+    """
+    ID ranges of the benchmark database and a seeded random source for picking rows.
+    """
+
+    def __init__(self, conn, seed):
+        self.rng = random.Random(seed)
+        self.max_user = conn.execute("SELECT IFNULL(MAX(user_id), 0) FROM Users").fetchone()[0]
+        self.max_task = conn.execute("SELECT IFNULL(MAX(task_id), 0) FROM Tasks").fetchone()[0]
+        self.max_tag = conn.execute("SELECT IFNULL(MAX(tag_id), 0) FROM Tags").fetchone()[0]
+
+    def user(self):
+        return self.rng.randint(1, self.max_user)
+
+    def task(self):
+        return self.rng.randint(1, self.max_task)
+
+    def tag(self):
+        return self.rng.randint(1, self.max_tag)
+
+    def new_user(self):
+        return sql.create_user("Bench", "bench@tf141.mil")
+
+    def new_task(self):
+        return sql.create_task(self.user(), "bench task", "2030-01-01", "Open")
+
+    def new_tag(self):
+        return sql.create_tag("bench")
+
+    def user_with_tasks(self, count=20):
+        user_id = self.new_user()
+        sql.create_tasks_bulk([(user_id, "bench task", "2000-01-01", "Complete")] * count)
+        return user_id
+
+    def old_completed_tasks(self, count=100):
+        # due before any generated task, so the returned cutoff archives just these
+        sql.create_tasks_bulk([(self.user(), "bench task", "2000-01-01", "Complete")] * count)
+        return '2000-01-02'
+
+    def change_cursor(self, count=100):
+        # cursor followed by `count` changes to read back
+        cursor = sql.latest_change_cursor()
+        sql.create_tasks_bulk([(self.user(), "bench task", "2030-01-01", "Open")] * count)
+        return cursor
+
+
+# Each case is (name, setup, call): setup(ctx) returns the arguments and is not timed,
+# call(*args) is. Write cases create their own rows, so the database is never depleted.
+CASES = [
+    ('read_users', lambda c: (), sql.read_users),
+    ('read_users_page', lambda c: (c.user(), 100), sql.read_users_page),
+    ('iter_users', lambda c: (), lambda: sum(1 for _ in sql.iter_users())),
+    ('read_user', lambda c: (c.user(),), sql.read_user),
+    ('create_user', lambda c: ("Bench", "bench@tf141.mil"), sql.create_user),
+    ('create_users_bulk', lambda c: ([("Bench", "bench@tf141.mil")] * 1000,), sql.create_users_bulk),
+    ('update_user', lambda c: (c.user(), "Bench", "bench@tf141.mil"), sql.update_user),
+    ('delete_user', lambda c: (c.new_user(),), sql.delete_user),
+    ('purge_user', lambda c: (c.user_with_tasks(),), sql.purge_user),
+
+    ('create_user_details', lambda c: (c.new_user(), "555", "sms", "Base"), sql.create_user_details),
+    ('create_users_details_bulk', lambda c: ([(c.new_user(), "555", "sms", "Base") for _ in range(100)],),
+     sql.create_users_details_bulk),
+    ('read_user_details', lambda c: (c.user(),), sql.read_user_details),
+    ('read_users_details', lambda c: (), sql.read_users_details),
+    ('read_users_details_page', lambda c: (c.user(), 100), sql.read_users_details_page),
+    ('iter_users_details', lambda c: (), lambda: sum(1 for _ in sql.iter_users_details())),
+    ('update_user_details', lambda c: (c.user(), "555", "sms", "Base"), sql.update_user_details),
+    ('delete_user_details', lambda c: (c.user(),), sql.delete_user_details),
+
+    ('create_task', lambda c: (c.user(), "bench task", "2030-01-01", "Open"), sql.create_task),
+    ('create_tasks_bulk', lambda c: ([(c.user(), "bench task", "2030-01-01", "Open")] * 1000,),
+     sql.create_tasks_bulk),
+    ('read_tasks', lambda c: (), sql.read_tasks),
+    ('read_tasks_page', lambda c: (c.task(), 100), sql.read_tasks_page),
+    ('iter_tasks', lambda c: (), lambda: sum(1 for _ in sql.iter_tasks())),
+    ('read_task', lambda c: (c.task(),), sql.read_task),
+    ('update_task', lambda c: (c.user(), "bench task", "2030-01-01", "Open", c.task()), sql.update_task),
+    ('delete_task', lambda c: (c.new_task(),), sql.delete_task),
+    ('purge_tasks', lambda c: ([c.new_task() for _ in range(10)],), sql.purge_tasks),
+    ('mark_task_as_complete', lambda c: (c.task(),), sql.mark_task_as_complete),
+    ('query_tasks', lambda c: (c.user(), 'Open', '2030-12-31'), lambda *a: sql.query_tasks(*a, limit=100)),
+    ('query_task_columns', lambda c: (), lambda: sql.query_task_columns(('task_id', 'user_id', 'due_date', 'status'))),
+    ('query_tasks_by_tag', lambda c: ([c.tag()],), lambda tags: sql.query_tasks(tag_ids=tags, limit=100)),
+    ('search_tasks', lambda c: (c.rng.choice(('soap', 'extract convoy', 'radio')),), sql.search_tasks),
+    ('read_upcoming_tasks', lambda c: ((date.today() + timedelta(days=c.rng.randint(0, 300))).isoformat(),),
+     sql.read_upcoming_tasks),
+    ('task_stats', lambda c: (c.user(),), sql.task_stats),
+    ('archive_completed_tasks', lambda c: (c.old_completed_tasks(),), sql.archive_completed_tasks),
+    ('read_archived_tasks_page', lambda c: (c.task(), 100), sql.read_archived_tasks_page),
+    ('iter_archived_tasks', lambda c: (), lambda: sum(1 for _ in sql.iter_archived_tasks())),
+
+    ('create_tag', lambda c: ("bench",), sql.create_tag),
+    ('create_tags_bulk', lambda c: (["bench"] * 1000,), sql.create_tags_bulk),
+    ('read_tags', lambda c: (), sql.read_tags),
+    ('read_tags_page', lambda c: (c.tag(), 100), sql.read_tags_page),
+    ('iter_tags', lambda c: (), lambda: sum(1 for _ in sql.iter_tags())),
+    ('read_tag', lambda c: (c.tag(),), sql.read_tag),
+    ('update_tag', lambda c: (c.tag(), "bench"), sql.update_tag),
+    ('delete_tag', lambda c: (c.new_tag(),), sql.delete_tag),
+
+    ('create_task_tag_relation', lambda c: (c.new_task(), c.tag()), sql.create_task_tag_relation),
+    ('create_task_tag_relations_bulk', lambda c: ([(c.new_task(), c.tag()) for _ in range(100)],),
+     sql.create_task_tag_relations_bulk),
+    ('tag_tasks', lambda c: ([c.new_task() for _ in range(10)], [c.tag() for _ in range(3)]), sql.tag_tasks),
+    ('untag_tasks', lambda c: ([c.task() for _ in range(10)], [c.tag() for _ in range(3)]), sql.untag_tasks),
+    ('read_tags_for_task', lambda c: (c.task(),), sql.read_tags_for_task),
+    ('read_tasks_for_tag', lambda c: (c.tag(),), sql.read_tasks_for_tag),
+    ('read_tags_details_for_task', lambda c: (c.task(),), sql.read_tags_details_for_task),
+    ('read_tasks_details_for_tag', lambda c: (c.tag(),), sql.read_tasks_details_for_tag),
+    ('remove_tag_from_task', lambda c: (c.task(),), sql.remove_tag_from_task),
+
+    ('latest_change_cursor', lambda c: (), sql.latest_change_cursor),
+    ('changes_since', lambda c: (c.change_cursor(), 100), sql.changes_since),
+    ('compact_changes', lambda c: (datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),), sql.compact_changes),
+]
+
+
+def run_case(ctx, setup, call, repeat):
+    """
+    Time `repeat` calls and return summary statistics in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup(ctx)
+        start = time.perf_counter()
+        call(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'calls': repeat,
+        'min_ms': timings[0],
+        'median_ms': statistics.median(timings),
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'mean_ms': statistics.fmean(timings),
+        'ops_per_sec': repeat / (sum(timings) / 1000) if sum(timings) else None,
+    }
+
+
+def table_counts(conn):
+    return {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ('Users', 'UserDetails', 'Tasks', 'Tags', 'TaskTags')
+    }
+
+
+def run(db_path, repeat=50, full_repeat=3, only=None, skip=None, cache=False, seed=141, report=print):
+    """
+    Run every benchmark case against a temporary copy of db_path.
+
+    Full-table reads (read_<table>s, iter_*) use full_repeat instead of repeat.
+
+    Returns:
+    dict: {'meta': {...}, 'results': {case name: statistics}}
+    """
+    uncovered = sorted(set(data_functions()) - {case[0] for case in CASES})
+    if uncovered and report:
+        report(f"Warning: no benchmark case for {', '.join(uncovered)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_path = os.path.join(tmp, 'bench.db')
+        create_db.copy_database(db_path, copy_path)
+
+        sql.configure(copy_path)
+        sql.configure_cache(maxsize=4096 if cache else 0)
+        conn = sql.get_connection()
+        meta = {
+            'database': os.path.abspath(db_path),
+            'rows': table_counts(conn),
+            'sqlite_version': sqlite3.sqlite_version,
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'pragmas': dict(sql.PRAGMAS),
+            'cache': cache,
+            'repeat': repeat,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        ctx = Context(conn, seed)
+        results = {}
+        for name, setup, call in CASES:
+            if only and not re.search(only, name) or skip and re.search(skip, name):
+                continue
+            full_read = name.startswith('iter_') or name in ('read_users', 'read_users_details', 'read_tasks', 'read_tags',
+                                                             'query_task_columns')
+            results[name] = run_case(ctx, setup, call, full_repeat if full_read else repeat)
+            if report:
+                report(f"{name:32} median {results[name]['median_ms']:9.3f} ms   p95 {results[name]['p95_ms']:9.3f} ms")
+        sql.close_all_connections()
+    return {'meta': meta, 'results': results}
+
+
+def compare(results, baseline, report=print):
+    """
+    Print the median change of each case against a baseline results file.
+    """
+    report(f"{'case':32} {'baseline':>12} {'now':>12} {'change':>9}")
+    for name, stats in results['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        change = (stats['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+        report(f"{name:32} {before['median_ms']:10.3f}ms {stats['median_ms']:10.3f}ms {change:+8.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sql.py data layer.")
+    parser.add_argument('--db', default='bench_10k.db', help="database to benchmark (see generate_data.py)")
+    parser.add_argument('--repeat', type=int, default=50, help="calls per case")
+    parser.add_argument('--full-repeat', type=int, default=3, help="calls per full-table read case")
+    parser.add_argument('--only', help="regex; only run matching cases")
+    parser.add_argument('--skip', help="regex; skip matching cases")
+    parser.add_argument('--cache', action='store_true', help="keep the lookup cache enabled")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against a previous JSON results file")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist; create it with generate_data.py")
+    results = run(args.db, args.repeat, args.full_repeat, args.only, args.skip, args.cache)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,383 @@
+"""
+Non-interactive, scriptable command line for TaskForce141.
+
+Every subcommand maps onto a sql.py function:
+    python main.py users create --name Price --email price@tf141.mil
+    python main.py tasks create --user-id 1 --description "Extract Soap" --due-date 2025-01-31 --status Open
+    python main.py tasks list --json
+    python main.py tags assign 12 3
+
+Batch mode reads one command per line from stdin and runs them all on one
+connection in one transaction; each command runs in its own savepoint, so a
+failing command is reported and undone without losing the others:
+    python main.py batch --json < commands.txt
+"""
+
+import argparse
+import json
+import shlex
+import sqlite3
+import sys
+import time
+
+import sql
+
+USER_COLUMNS = ('user_id', 'name', 'email')
+USER_DETAILS_COLUMNS = ('user_id', 'phone', 'preferences', 'address')
+TASK_COLUMNS = ('task_id', 'user_id', 'description', 'due_date', 'status')
+ARCHIVED_TASK_COLUMNS = TASK_COLUMNS + ('archived_at',)
+TAG_COLUMNS = ('tag_id', 'name')
+CHANGE_COLUMNS = ('seq', 'table_name', 'op', 'row_id', 'related_id', 'changed_at')
+
+# Top-level commands; main.py hands argv to this module when it starts with one of them.
+COMMANDS = ('users', 'details', 'tasks', 'tags', 'changes', 'batch')
+
+
+class CommandError(Exception):
+    """A command could not be parsed or completed, e.g. the requested row does not exist."""
+
+
+class CommandExit(CommandError):
+    """A command ended without running, e.g. after printing --help; status is the exit code."""
+
+    def __init__(self, status):
+        super().__init__(f"exited with status {status}")
+        self.status = status
+
+
+class CommandParser(argparse.ArgumentParser):
+    """Argument parser that raises CommandError instead of exiting, so batch mode can carry on."""
+
+    def error(self, message):
+        raise CommandError(message)
+
+    def exit(self, status=0, message=None):
+        # --help exits after printing; end the command, not the process (or a batch's transaction)
+        if message:
+            sys.stderr.write(message)
+        raise CommandExit(status)
+
+
+# ====================== Handlers ======================
+# Each handler takes the parsed arguments and returns (columns, rows) to print.
+
+def _one(row, columns, what):
+    if row is None:
+        raise CommandError(f"{what} not found")
+    return columns, [row]
+
+
+def _listing(args, read_page, iterate, columns):
+    if args.limit is not None:
+        return columns, read_page(args.after_id, args.limit)
+    return columns, iterate(after_id=args.after_id)
+
+
+def _task_listing(args):
+    filters = {
+        'user_id': args.user_id, 'status': args.status, 'tag_ids': args.tag_ids,
+        'due_before': args.due_before, 'due_after': args.due_after,
+    }
+    if args.order_by != 'task_id' and args.after_id:
+        # after_id pages by task_id; in any other order it would return the first page again
+        raise CommandError("--after-id requires --order-by task_id")
+    if args.order_by == 'task_id' and all(value is None for value in filters.values()):
+        return _listing(args, sql.read_tasks_page, sql.iter_tasks, TASK_COLUMNS)
+    after_id = args.after_id if args.order_by == 'task_id' else None
+    return TASK_COLUMNS, sql.query_tasks(**filters, order_by=args.order_by, limit=args.limit, after_id=after_id)
+
+
+def _task_stats(args):
+    stats = sql.task_stats(args.user_id)
+    if not stats:
+        raise CommandError("statistics are unavailable")
+    columns, row = ['total', 'open', 'overdue'], [stats['total'], stats['open'], stats['overdue']]
+    if 'user' in stats:
+        columns += ['user_tasks', 'user_open']
+        row += [stats['user']['tasks'], stats['user']['open']]
+    columns += [f"status:{status}" for status in stats['by_status']]
+    row += stats['by_status'].values()
+    return tuple(columns), [tuple(row)]
+
+
+def _changes(args):
+    try:
+        changes, cursor = sql.changes_since(args.cursor, args.limit)
+    except ValueError as e:
+        raise CommandError(e)
+    sys.stderr.write(f"next cursor: {cursor}\n")
+    return CHANGE_COLUMNS, changes
+
+
+def _created(column, new_id):
+    if new_id is None:
+        raise CommandError("nothing was created")
+    return (column,), [(new_id,)]
+
+
+def _done(count=None):
+    return ('ok',), [(True if count is None else count,)]
+
+
+HANDLERS = {
+    ('users', 'create'): lambda a: _created('user_id', sql.create_user(a.name, a.email)),
+    ('users', 'get'): lambda a: _one(sql.read_user(a.user_id), USER_COLUMNS, f"User {a.user_id}"),
+    ('users', 'list'): lambda a: _listing(a, sql.read_users_page, sql.iter_users, USER_COLUMNS),
+    ('users', 'update'): lambda a: _done(sql.update_user(a.user_id, a.name, a.email)),
+    ('users', 'delete'): lambda a: _done(sql.delete_user(a.user_id)),
+    ('users', 'purge'): lambda a: _done(sql.purge_user(a.user_id)),
+
+    ('details', 'create'): lambda a: _done(sql.create_user_details(a.user_id, a.phone, a.preferences, a.address)),
+    ('details', 'get'): lambda a: _one(sql.read_user_details(a.user_id), USER_DETAILS_COLUMNS,
+                                       f"Details for user {a.user_id}"),
+    ('details', 'list'): lambda a: _listing(a, sql.read_users_details_page, sql.iter_users_details,
+                                            USER_DETAILS_COLUMNS),
+    ('details', 'update'): lambda a: _done(sql.update_user_details(a.user_id, a.phone, a.preferences, a.address)),
+    ('details', 'delete'): lambda a: _done(sql.delete_user_details(a.user_id)),
+
+    ('tasks', 'create'): lambda a: _created('task_id', sql.create_task(a.user_id, a.description, a.due_date, a.status)),
+    ('tasks', 'get'): lambda a: _one(sql.read_task(a.task_id), TASK_COLUMNS, f"Task {a.task_id}"),
+    ('tasks', 'list'): lambda a: _task_listing(a),
+    ('tasks', 'update'): lambda a: _done(sql.update_task(a.user_id, a.description, a.due_date, a.status, a.task_id)),
+    ('tasks', 'delete'): lambda a: _done(sql.delete_task(a.task_id)),
+    ('tasks', 'complete'): lambda a: _done(sql.mark_task_as_complete(a.task_id)),
+    ('tasks', 'for-tag'): lambda a: (TASK_COLUMNS, sql.read_tasks_details_for_tag(a.tag_id)),
+    ('tasks', 'search'): lambda a: (TASK_COLUMNS, sql.search_tasks(a.query, a.limit, a.raw)),
+    ('tasks', 'stats'): lambda a: _task_stats(a),
+    ('tasks', 'purge'): lambda a: _done(sql.purge_tasks(a.task_ids)),
+    ('tasks', 'archive'): lambda a: _done(sql.archive_completed_tasks(a.before, a.batch_size)),
+    ('tasks', 'archived'): lambda a: _listing(a, sql.read_archived_tasks_page, sql.iter_archived_tasks,
+                                              ARCHIVED_TASK_COLUMNS),
+
+    ('tags', 'create'): lambda a: _created('tag_id', sql.create_tag(a.name)),
+    ('tags', 'get'): lambda a: _one(sql.read_tag(a.tag_id), TAG_COLUMNS, f"Tag {a.tag_id}"),
+    ('tags', 'list'): lambda a: _listing(a, sql.read_tags_page, sql.iter_tags, TAG_COLUMNS),
+    ('tags', 'update'): lambda a: _done(sql.update_tag(a.tag_id, a.name)),
+    ('tags', 'delete'): lambda a: _done(sql.delete_tag(a.tag_id)),
+    ('tags', 'for-task'): lambda a: (TAG_COLUMNS, sql.read_tags_details_for_task(a.task_id)),
+    ('tags', 'assign'): lambda a: _done(sql.create_task_tag_relation(a.task_id, a.tag_id)),
+    ('tags', 'unassign'): lambda a: _done(sql.remove_tag_from_task(a.task_id, a.tag_id)),
+    ('tags', 'bulk-assign'): lambda a: _done(sql.tag_tasks(a.task_ids, a.tag_ids)),
+    ('tags', 'bulk-unassign'): lambda a: _done(sql.untag_tasks(a.task_ids, a.tag_ids)),
+
+    ('changes', 'list'): lambda a: _changes(a),
+    ('changes', 'cursor'): lambda a: (('cursor',), [(sql.latest_change_cursor(),)]),
+    ('changes', 'compact'): lambda a: _done(sql.compact_changes(a.before, a.batch_size)),
+}
+
+
+# ====================== Parser ======================
+
+def _ids(text):
+    return [int(part) for part in text.split(',') if part.strip()]
+
+
+def build_parser():
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--json', action='store_true', help="print one JSON object per row")
+
+    parser = CommandParser(prog='main.py', description="TaskForce141 scriptable interface.")
+    groups = parser.add_subparsers(dest='group', required=True)
+
+    def group(name, help):
+        return groups.add_parser(name, help=help).add_subparsers(dest='command', required=True)
+
+    def command(commands, name, **kwargs):
+        # every command accepts --json after its own arguments
+        return commands.add_parser(name, parents=[output], **kwargs)
+
+    def listing(commands, name='list', **kwargs):
+        p = command(commands, name, **kwargs)
+        p.add_argument('--after-id', type=int, default=0, help="only rows with a larger ID")
+        p.add_argument('--limit', type=int, help="return at most this many rows")
+        return p
+
+    users = group('users', "manage users")
+    p = command(users, 'create')
+    p.add_argument('--name', required=True)
+    p.add_argument('--email', required=True)
+    command(users, 'get').add_argument('user_id', type=int)
+    listing(users)
+    p = command(users, 'update')
+    p.add_argument('user_id', type=int)
+    p.add_argument('--name', required=True)
+    p.add_argument('--email', required=True)
+    command(users, 'delete').add_argument('user_id', type=int)
+    command(users, 'purge', help="delete a user with their details, tasks and archived tasks"
+            ).add_argument('user_id', type=int)
+
+    details = group('details', "manage user details")
+    for name in ('create', 'update'):
+        p = command(details, name)
+        p.add_argument('user_id', type=int)
+        p.add_argument('--phone', default='')
+        p.add_argument('--preferences', default='')
+        p.add_argument('--address', default='')
+    command(details, 'get').add_argument('user_id', type=int)
+    listing(details)
+    command(details, 'delete').add_argument('user_id', type=int)
+
+    tasks = group('tasks', "manage tasks")
+    p = command(tasks, 'create')
+    p.add_argument('--user-id', type=int, required=True)
+    p.add_argument('--description', required=True)
+    p.add_argument('--due-date', required=True, help="YYYY-MM-DD")
+    p.add_argument('--status', default='Open')
+    command(tasks, 'get').add_argument('task_id', type=int)
+    p = listing(tasks)
+    p.add_argument('--user-id', type=int)
+    p.add_argument('--status', action='append', help="may be repeated")
+    p.add_argument('--due-after', help="YYYY-MM-DD, inclusive")
+    p.add_argument('--due-before', help="YYYY-MM-DD, inclusive")
+    p.add_argument('--tag-ids', type=_ids, help="comma separated; tasks with any of these tags")
+    p.add_argument('--order-by', default='task_id', choices=[
+        prefix + column for column in sql.TASK_ORDER_COLUMNS for prefix in ('', '-')],
+        help="prefix with - for descending, e.g. --order-by=-due_date")
+    p = command(tasks, 'update')
+    p.add_argument('task_id', type=int)
+    p.add_argument('--user-id', type=int, required=True)
+    p.add_argument('--description', required=True)
+    p.add_argument('--due-date', required=True, help="YYYY-MM-DD")
+    p.add_argument('--status', required=True)
+    command(tasks, 'delete').add_argument('task_id', type=int)
+    command(tasks, 'complete').add_argument('task_id', type=int)
+    command(tasks, 'for-tag').add_argument('tag_id', type=int)
+    p = command(tasks, 'search')
+    p.add_argument('query')
+    p.add_argument('--limit', type=int, default=20)
+    p.add_argument('--raw', action='store_true', help="use FTS5 query syntax")
+    command(tasks, 'stats', help="task counts by status, open and overdue").add_argument('--user-id', type=int)
+    command(tasks, 'purge', help="delete live or archived tasks with their tag links"
+            ).add_argument('task_ids', type=_ids, help="comma separated task IDs")
+    p = command(tasks, 'archive', help="move completed tasks due before a date to the archive")
+    p.add_argument('--before', required=True, help="YYYY-MM-DD")
+    p.add_argument('--batch-size', type=int, default=sql.ARCHIVE_BATCH_SIZE, help="tasks moved per transaction")
+    listing(tasks, 'archived', help="list archived tasks")
+
+    tags = group('tags', "manage tags and task-tag links")
+    command(tags, 'create').add_argument('name')
+    command(tags, 'get').add_argument('tag_id', type=int)
+    listing(tags)
+    p = command(tags, 'update')
+    p.add_argument('tag_id', type=int)
+    p.add_argument('name')
+    command(tags, 'delete').add_argument('tag_id', type=int)
+    command(tags, 'for-task').add_argument('task_id', type=int)
+    p = command(tags, 'assign')
+    p.add_argument('task_id', type=int)
+    p.add_argument('tag_id', type=int)
+    p = command(tags, 'unassign', help="remove one tag, or all tags when tag_id is omitted")
+    p.add_argument('task_id', type=int)
+    p.add_argument('tag_id', type=int, nargs='?')
+    for name in ('bulk-assign', 'bulk-unassign'):
+        p = command(tags, name)
+        p.add_argument('task_ids', type=_ids, help="comma separated task IDs")
+        p.add_argument('tag_ids', type=_ids, help="comma separated tag IDs")
+
+    changes = group('changes', "follow the change log of users, details, tasks, tags and task-tag links")
+    p = command(changes, 'list', help="changes after a cursor, oldest first; the next cursor goes to stderr")
+    p.add_argument('--cursor', help="cursor from the previous list or from 'changes cursor'")
+    p.add_argument('--limit', type=int, default=sql.PAGE_SIZE)
+    command(changes, 'cursor', help="the cursor of the newest change")
+    p = command(changes, 'compact', help="delete changes recorded before a time")
+    p.add_argument('--before', required=True, help="UTC 'YYYY-MM-DD HH:MM:SS'")
+    p.add_argument('--batch-size', type=int, default=sql.COMPACT_BATCH_SIZE, help="changes deleted per transaction")
+
+    p = groups.add_parser('batch', parents=[output], help="run commands read from stdin in one transaction")
+    p.add_argument('--stop-on-error', action='store_true',
+                   help="roll back everything and stop at the first failing command")
+    return parser
+
+
+# ====================== Running ======================
+
+def emit(columns, rows, as_json, out=sys.stdout):
+    """
+    Print rows as JSON objects (one per line) or as tab separated values.
+    """
+    for row in rows:
+        if as_json:
+            out.write(json.dumps(dict(zip(columns, row))) + '\n')
+        else:
+            out.write('\t'.join('' if value is None else str(value) for value in row) + '\n')
+
+
+def run_command(args, out=sys.stdout):
+    """
+    Run one parsed command and print its result, raising sqlite3.Error or
+    CommandError on failure.
+    """
+    with sql.raise_errors():
+        columns, rows = HANDLERS[(args.group, args.command)](args)
+        emit(columns, rows, args.json, out)
+
+
+def run_batch(parser, lines, as_json=False, stop_on_error=False, out=sys.stdout, err=sys.stderr):
+    """
+    Run one command per line in a single transaction.
+
+    Blank lines and lines starting with # are skipped. Failures are reported on
+    `err` with their line number; each failed command is rolled back on its own
+    unless stop_on_error is set, in which case the whole batch is rolled back.
+
+    Returns:
+    tuple: (commands run, commands failed)
+    """
+    run = failed = 0
+    start = time.perf_counter()
+    try:
+        with sql.transaction():
+            for number, line in enumerate(lines, start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                run += 1
+                try:
+                    try:
+                        words = shlex.split(line)
+                    except ValueError as e:  # e.g. an unbalanced quote
+                        raise CommandError(e) from None
+                    args = parser.parse_args(words)
+                    if args.group == 'batch':
+                        raise CommandError("batch cannot be nested")
+                    args.json = args.json or as_json
+                    with sql.transaction():
+                        run_command(args, out)
+                except (sqlite3.Error, CommandError) as e:
+                    if isinstance(e, CommandExit) and not e.status:
+                        continue  # the line only asked for --help
+                    failed += 1
+                    err.write(f"line {number}: error: {e}\n")
+                    if stop_on_error:
+                        raise
+    except (sqlite3.Error, CommandError):
+        err.write("batch rolled back\n")
+    elapsed = time.perf_counter() - start
+    rate = run / elapsed if elapsed else 0
+    err.write(f"{run} commands, {failed} failed in {elapsed:.2f}s ({rate:,.0f} commands/sec)\n")
+    return run, failed
+
+
+def main(argv=None):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except CommandExit as e:
+        return e.status
+    except CommandError as e:
+        parser.print_usage(sys.stderr)
+        sys.stderr.write(f"error: {e}\n")
+        return 2
+    if args.group == 'batch':
+        run, failed = run_batch(parser, sys.stdin, args.json, args.stop_on_error)
+        return 1 if failed else 0
+    try:
+        run_command(args)
+    except (sqlite3.Error, CommandError) as e:
+        sys.stderr.write(f"error: {e}\n")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
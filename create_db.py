@@ -1,23 +1,55 @@
+import os
 import sqlite3
+import sys
 
-def create_db():
-    try:
-        # Connect to the SQLite database
-        conn = sqlite3.connect('todo_list.db')
-        # Enable foreign key constraints
-        conn.execute('PRAGMA foreign_keys = ON;')
-        
-        # Create Users table
-        conn.execute('''   
+DB_PATH = 'todo_list.db'
+
+
+def _change_log_triggers(table, key, related_key=None):
+    """
+    Return the statements creating the triggers that record each insert, update
+    and delete of `table` in ChangeLog, by its key (and related_key for TaskTags).
+    An update that changes the key is recorded as a delete and an insert.
+    """
+    new_related = f"new.{related_key}" if related_key else 'NULL'
+    old_related = f"old.{related_key}" if related_key else 'NULL'
+    key_changed = f"old.{key} IS NOT new.{key}" + (f" OR {old_related} IS NOT {new_related}" if related_key else '')
+    name = table.lower()
+    return [
+        f"""
+        CREATE TRIGGER {name}_changes_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO ChangeLog (table_name, op, row_id, related_id) VALUES ('{table}', 'insert', new.{key}, {new_related});
+        END;
+        """,
+        f"""
+        CREATE TRIGGER {name}_changes_update AFTER UPDATE ON {table} BEGIN
+            INSERT INTO ChangeLog (table_name, op, row_id, related_id)
+                SELECT '{table}', 'delete', old.{key}, {old_related} WHERE {key_changed};
+            INSERT INTO ChangeLog (table_name, op, row_id, related_id)
+                VALUES ('{table}', CASE WHEN {key_changed} THEN 'insert' ELSE 'update' END, new.{key}, {new_related});
+        END;
+        """,
+        f"""
+        CREATE TRIGGER {name}_changes_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO ChangeLog (table_name, op, row_id, related_id) VALUES ('{table}', 'delete', old.{key}, {old_related});
+        END;
+        """,
+    ]
+
+
+# Schema migrations, in order. Applying migration N moves the database to
+# PRAGMA user_version N, so each one runs exactly once per database file.
+MIGRATIONS = [
+    # 1: Base tables
+    [
+        '''
         CREATE TABLE IF NOT EXISTS Users (
             user_id INTEGER PRIMARY KEY,
             name TEXT,
-            email TEXT 
-            );    
-        ''')
-
-        # Create UserDetails table
-        conn.execute('''
+            email TEXT
+            );
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS UserDetails (
             user_id INTEGER PRIMARY KEY,
             phone TEXT,
@@ -25,18 +57,14 @@ def create_db():
             address TEXT,
             FOREIGN KEY (user_id) REFERENCES Users(user_id)
             );
-        ''')
-
-        # Create Tags table
-        conn.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS Tags (
             tag_id INTEGER PRIMARY KEY,
             name TEXT
             );
-        ''')
-
-        # Create Tasks table
-        conn.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS Tasks (
             task_id INTEGER PRIMARY KEY,
             user_id INTEGER,
@@ -45,10 +73,8 @@ def create_db():
             status TEXT,
             FOREIGN KEY (user_id) REFERENCES Users(user_id)
             );
-        ''')
-
-        # Create TaskTags table
-        conn.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS TaskTags (
             task_id INTEGER,
             task TEXT,
@@ -58,15 +84,450 @@ def create_db():
             FOREIGN KEY (tag_id) REFERENCES Tags(tag_id),
             PRIMARY KEY (task_id, tag_id)
             );
-        ''')
+        ''',
+    ],
+    # 2: Secondary indexes for per-user, per-status, due-date and per-tag lookups
+    [
+        'CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON Tasks(user_id);',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_status ON Tasks(status);',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON Tasks(due_date);',
+        'CREATE INDEX IF NOT EXISTS idx_tasktags_tag_id ON TaskTags(tag_id);',
+    ],
+    # 3: TaskTags becomes a pure (task_id, tag_id) link table; text is resolved by join
+    [
+        '''
+        CREATE TABLE TaskTags_new (
+            task_id INTEGER,
+            tag_id INTEGER,
+            FOREIGN KEY (task_id) REFERENCES Tasks(task_id),
+            FOREIGN KEY (tag_id) REFERENCES Tags(tag_id),
+            PRIMARY KEY (task_id, tag_id)
+            ) WITHOUT ROWID;
+        ''',
+        'INSERT INTO TaskTags_new (task_id, tag_id) SELECT task_id, tag_id FROM TaskTags;',
+        'DROP TABLE TaskTags;',
+        'ALTER TABLE TaskTags_new RENAME TO TaskTags;',
+        'CREATE INDEX idx_tasktags_tag_id ON TaskTags(tag_id);',
+    ],
+    # 4: Full-text index over task descriptions, kept in sync with Tasks by triggers
+    [
+        "CREATE VIRTUAL TABLE TasksFTS USING fts5(description, content='Tasks', content_rowid='task_id');",
+        '''
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON Tasks BEGIN
+            INSERT INTO TasksFTS (rowid, description) VALUES (new.task_id, new.description);
+        END;
+        ''',
+        '''
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON Tasks BEGIN
+            INSERT INTO TasksFTS (TasksFTS, rowid, description) VALUES ('delete', old.task_id, old.description);
+        END;
+        ''',
+        '''
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF description ON Tasks BEGIN
+            INSERT INTO TasksFTS (TasksFTS, rowid, description) VALUES ('delete', old.task_id, old.description);
+            INSERT INTO TasksFTS (rowid, description) VALUES (new.task_id, new.description);
+        END;
+        ''',
+        "INSERT INTO TasksFTS (TasksFTS) VALUES ('rebuild');",
+    ],
+    # 5: Composite index for per-user filtered queries ("my open tasks due this week");
+    #    it also serves plain user_id lookups, so the single-column index goes
+    [
+        'CREATE INDEX idx_tasks_user_status_due ON Tasks(user_id, status, due_date);',
+        'DROP INDEX IF EXISTS idx_tasks_user_id;',
+    ],
+    # 6: Counter tables for task statistics, maintained by triggers on Tasks and TaskTags.
+    #    A task is open unless its status is 'Complete'; NULL statuses are counted under ''.
+    [
+        'CREATE TABLE TaskStatusCounts (status TEXT PRIMARY KEY, task_count INTEGER NOT NULL) WITHOUT ROWID;',
+        '''
+        CREATE TABLE UserTaskCounts (
+            user_id INTEGER PRIMARY KEY,
+            task_count INTEGER NOT NULL,
+            open_count INTEGER NOT NULL
+            );
+        ''',
+        'CREATE TABLE TagTaskCounts (tag_id INTEGER PRIMARY KEY, task_count INTEGER NOT NULL);',
+        'CREATE TABLE OpenTaskDueCounts (due_date TEXT PRIMARY KEY, task_count INTEGER NOT NULL) WITHOUT ROWID;',
+        '''
+        INSERT INTO TaskStatusCounts (status, task_count)
+        SELECT IFNULL(status, ''), COUNT(*) FROM Tasks GROUP BY IFNULL(status, '');
+        ''',
+        '''
+        INSERT INTO UserTaskCounts (user_id, task_count, open_count)
+        SELECT user_id, COUNT(*), SUM(status IS NOT 'Complete') FROM Tasks
+        WHERE user_id IS NOT NULL GROUP BY user_id;
+        ''',
+        'INSERT INTO TagTaskCounts (tag_id, task_count) SELECT tag_id, COUNT(*) FROM TaskTags GROUP BY tag_id;',
+        '''
+        INSERT INTO OpenTaskDueCounts (due_date, task_count)
+        SELECT due_date, COUNT(*) FROM Tasks
+        WHERE status IS NOT 'Complete' AND due_date IS NOT NULL GROUP BY due_date;
+        ''',
+        '''
+        CREATE TRIGGER task_counts_insert AFTER INSERT ON Tasks BEGIN
+            INSERT INTO TaskStatusCounts (status, task_count) VALUES (IFNULL(new.status, ''), 1)
+                ON CONFLICT (status) DO UPDATE SET task_count = task_count + 1;
+            INSERT INTO UserTaskCounts (user_id, task_count, open_count)
+                SELECT new.user_id, 1, new.status IS NOT 'Complete' WHERE new.user_id IS NOT NULL
+                ON CONFLICT (user_id) DO UPDATE SET task_count = task_count + 1,
+                    open_count = open_count + (new.status IS NOT 'Complete');
+            INSERT INTO OpenTaskDueCounts (due_date, task_count)
+                SELECT new.due_date, 1 WHERE new.status IS NOT 'Complete' AND new.due_date IS NOT NULL
+                ON CONFLICT (due_date) DO UPDATE SET task_count = task_count + 1;
+        END;
+        ''',
+        '''
+        CREATE TRIGGER task_counts_delete AFTER DELETE ON Tasks BEGIN
+            UPDATE TaskStatusCounts SET task_count = task_count - 1 WHERE status = IFNULL(old.status, '');
+            UPDATE UserTaskCounts SET task_count = task_count - 1,
+                open_count = open_count - (old.status IS NOT 'Complete') WHERE user_id = old.user_id;
+            UPDATE OpenTaskDueCounts SET task_count = task_count - 1
+                WHERE due_date = old.due_date AND old.status IS NOT 'Complete';
+        END;
+        ''',
+        '''
+        CREATE TRIGGER task_counts_update AFTER UPDATE OF user_id, status, due_date ON Tasks BEGIN
+            UPDATE TaskStatusCounts SET task_count = task_count - 1 WHERE status = IFNULL(old.status, '');
+            INSERT INTO TaskStatusCounts (status, task_count) VALUES (IFNULL(new.status, ''), 1)
+                ON CONFLICT (status) DO UPDATE SET task_count = task_count + 1;
+            UPDATE UserTaskCounts SET task_count = task_count - 1,
+                open_count = open_count - (old.status IS NOT 'Complete') WHERE user_id = old.user_id;
+            INSERT INTO UserTaskCounts (user_id, task_count, open_count)
+                SELECT new.user_id, 1, new.status IS NOT 'Complete' WHERE new.user_id IS NOT NULL
+                ON CONFLICT (user_id) DO UPDATE SET task_count = task_count + 1,
+                    open_count = open_count + (new.status IS NOT 'Complete');
+            UPDATE OpenTaskDueCounts SET task_count = task_count - 1
+                WHERE due_date = old.due_date AND old.status IS NOT 'Complete';
+            INSERT INTO OpenTaskDueCounts (due_date, task_count)
+                SELECT new.due_date, 1 WHERE new.status IS NOT 'Complete' AND new.due_date IS NOT NULL
+                ON CONFLICT (due_date) DO UPDATE SET task_count = task_count + 1;
+        END;
+        ''',
+        '''
+        CREATE TRIGGER tag_counts_insert AFTER INSERT ON TaskTags BEGIN
+            INSERT INTO TagTaskCounts (tag_id, task_count) VALUES (new.tag_id, 1)
+                ON CONFLICT (tag_id) DO UPDATE SET task_count = task_count + 1;
+        END;
+        ''',
+        '''
+        CREATE TRIGGER tag_counts_delete AFTER DELETE ON TaskTags BEGIN
+            UPDATE TagTaskCounts SET task_count = task_count - 1 WHERE tag_id = old.tag_id;
+        END;
+        ''',
+    ],
+    # 7: Open tasks in due order, for the reminder scheduler (its query must repeat the WHERE clause).
+    [
+        "CREATE INDEX idx_tasks_open_due ON Tasks(due_date, task_id) WHERE status IS NOT 'Complete';",
+    ],
+    # 8: Shard files of a sharded database, see shard_database(); empty while unsharded
+    [
+        'CREATE TABLE ShardFiles (shard INTEGER PRIMARY KEY, path TEXT NOT NULL);',
+    ],
+    # 9: Archive of completed tasks and their tag links, see sql.archive_completed_tasks().
+    #    No foreign keys: archived rows are history and sql.purge_user() removes them.
+    [
+        '''
+        CREATE TABLE ArchivedTasks (
+            task_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            description TEXT,
+            due_date DATE,
+            status TEXT,
+            archived_at TEXT NOT NULL
+            );
+        ''',
+        'CREATE INDEX idx_archivedtasks_user_id ON ArchivedTasks(user_id);',
+        'CREATE TABLE ArchivedTaskTags (task_id INTEGER, tag_id INTEGER, PRIMARY KEY (task_id, tag_id)) WITHOUT ROWID;',
+        # Completed tasks in due order, for picking the ones to archive (the query must repeat the WHERE clause)
+        "CREATE INDEX idx_tasks_complete_due ON Tasks(due_date, task_id) WHERE status = 'Complete';",
+    ],
+    # 10: Change log of the UserDetails, Tasks and TaskTags rows, see sql.changes_since().
+    #     AUTOINCREMENT, so sequence numbers are never reused once compaction deletes entries;
+    #     ChangeLogHorizon holds the last compacted one.
+    [
+        '''
+        CREATE TABLE ChangeLog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            related_id INTEGER,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+            );
+        ''',
+        'CREATE TABLE ChangeLogHorizon (seq INTEGER NOT NULL);',
+        'INSERT INTO ChangeLogHorizon (seq) VALUES (0);',
+        *_change_log_triggers('UserDetails', 'user_id'),
+        *_change_log_triggers('Tasks', 'task_id'),
+        *_change_log_triggers('TaskTags', 'task_id', 'tag_id'),
+    ],
+    # 11: Change log of the Users and Tags rows, which stay in the catalog of a sharded database
+    [
+        *_change_log_triggers('Users', 'user_id'),
+        *_change_log_triggers('Tags', 'tag_id'),
+    ],
+]
 
-        # Commit the changes and close the connection
+# Migrations of the shard files of a sharded database. Shards hold the Tasks,
+# UserDetails and TaskTags rows, so they start from the current form of those
+# tables, without the foreign keys to Users and Tags in the catalog (sql.py checks
+# those with triggers), and then share the catalog's later Tasks migrations.
+# A new migration that touches these tables must be added here as well.
+SHARD_MIGRATIONS = [
+    # 1: Base tables and indexes
+    [
+        '''
+        CREATE TABLE UserDetails (
+            user_id INTEGER PRIMARY KEY,
+            phone TEXT,
+            preferences TEXT,
+            address TEXT
+            );
+        ''',
+        '''
+        CREATE TABLE Tasks (
+            task_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            description TEXT,
+            due_date DATE,
+            status TEXT
+            );
+        ''',
+        '''
+        CREATE TABLE TaskTags (
+            task_id INTEGER,
+            tag_id INTEGER,
+            FOREIGN KEY (task_id) REFERENCES Tasks(task_id),
+            PRIMARY KEY (task_id, tag_id)
+            ) WITHOUT ROWID;
+        ''',
+        'CREATE INDEX idx_tasks_status ON Tasks(status);',
+        'CREATE INDEX idx_tasks_due_date ON Tasks(due_date);',
+        'CREATE INDEX idx_tasktags_tag_id ON TaskTags(tag_id);',
+    ],
+    MIGRATIONS[3],  # 2: full-text index
+    MIGRATIONS[4],  # 3: per-user composite index
+    MIGRATIONS[5],  # 4: counter tables
+    MIGRATIONS[6],  # 5: open tasks in due order
+    MIGRATIONS[8],  # 6: archive of completed tasks
+    MIGRATIONS[9],  # 7: change log
+]
+
+# Representative lookups and the index each one should use once migrated.
+QUERY_PLAN_CHECKS = [
+    ("SELECT * FROM Tasks WHERE user_id = 1", 'idx_tasks_user_status_due'),
+    ("SELECT * FROM Tasks WHERE user_id = 1 AND status = 'Open' AND due_date <= '2000-01-07'",
+     'idx_tasks_user_status_due'),
+    ("SELECT * FROM Tasks WHERE status = 'Open'", 'idx_tasks_status'),
+    ("SELECT * FROM Tasks WHERE due_date < '2000-01-01'", 'idx_tasks_due_date'),
+    ("SELECT * FROM Tasks WHERE status IS NOT 'Complete' AND (due_date, task_id) > ('2000-01-01', 0) "
+     "ORDER BY due_date, task_id", 'idx_tasks_open_due'),
+    ("SELECT task_id FROM Tasks INDEXED BY idx_tasks_complete_due WHERE status = 'Complete' "
+     "AND due_date < '2000-01-01' ORDER BY due_date, task_id",
+     'idx_tasks_complete_due'),
+    ("SELECT task_id FROM TaskTags WHERE tag_id = 1", 'idx_tasktags_tag_id'),
+]
+
+
+def schema_version(conn):
+    """
+    Return the schema version (PRAGMA user_version) of a database.
+    """
+    return conn.execute('PRAGMA user_version;').fetchone()[0]
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """
+    Apply any migrations the database has not seen yet; pass SHARD_MIGRATIONS for a shard file.
+
+    The version is re-read under a write lock, so concurrent processes starting
+    at the same time apply each migration only once.
+
+    Returns:
+    int: The number of migrations applied.
+    """
+    if schema_version(conn) >= len(migrations):
+        return 0
+    conn.execute('BEGIN IMMEDIATE;')
+    try:
+        version = schema_version(conn)
+        for number, statements in enumerate(migrations[version:], start=version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {number};')
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(migrations) - version
+
+
+def check_query_plans(conn):
+    """
+    Print the query plan of each QUERY_PLAN_CHECKS lookup and whether it uses its index.
+
+    Returns:
+    bool: True if every lookup uses its expected index.
+    """
+    all_indexed = True
+    for query, index in QUERY_PLAN_CHECKS:
+        try:
+            plan = ' | '.join(row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}'))
+        except sqlite3.Error as e:
+            plan = f"unavailable ({e})"
+        uses_index = index in plan
+        all_indexed = all_indexed and uses_index
+        print(f"[{'OK' if uses_index else 'SCAN'}] {query}\n       {plan}")
+    return all_indexed
+
+
+def shard_paths(conn, db_path):
+    """
+    Return the paths of a database's shard files, in shard order, or [] if it is not sharded.
+    Paths are stored relative to the catalog, so the files can be moved together.
+    """
+    return [os.path.join(os.path.dirname(db_path), path)
+            for (path,) in conn.execute('SELECT path FROM ShardFiles ORDER BY shard;')]
+
+
+def shard_database(db_path=DB_PATH, shards=4):
+    """
+    Split a database into a catalog and `shards` shard files next to it
+    (todo_list.shard0.db, ...). Users and Tags stay in db_path; the Tasks,
+    UserDetails and TaskTags rows of each user, and their archived tasks, move
+    to shard user_id % shards, and tasks without a user to shard 0.
+
+    Task IDs are allocated per shard so that task_id % shards is the task's
+    shard, which means existing tasks are renumbered here. Run it while nothing
+    else uses the database: the shard files commit one by one, not atomically.
+    The change log starts over, so change feed consumers must read everything again.
+
+    Returns:
+    list: The paths of the shard files.
+    """
+    if not 1 < shards <= 10:
+        raise ValueError("shards must be between 2 and 10 (SQLite attaches at most 10 databases)")
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute('PRAGMA foreign_keys = ON;')
+        migrate(conn)
+        if shard_paths(conn, db_path):
+            raise ValueError(f"{db_path} is already sharded")
+        stem, ext = os.path.splitext(os.path.basename(db_path))
+        names = [f"{stem}.shard{k}{ext or '.db'}" for k in range(shards)]
+        paths = [os.path.join(os.path.dirname(db_path), name) for name in names]
+        for path in paths:
+            if os.path.exists(path):
+                raise ValueError(f"{path} already exists")
+        for path in paths:
+            shard = sqlite3.connect(path)
+            shard.execute('PRAGMA journal_mode = WAL;')
+            migrate(shard, SHARD_MIGRATIONS)
+            shard.close()
+
+        for k, path in enumerate(paths):
+            conn.execute(f"ATTACH DATABASE ? AS shard{k};", (path,))
+        shard_of = f"(IFNULL(user_id, 0) % {shards} + {shards}) % {shards}"
+        conn.execute('BEGIN IMMEDIATE;')
+        try:
+            # Number each shard's tasks, live and archived, k + N, k + 2N, ... in their current order
+            conn.execute('CREATE TEMP TABLE task_shards (old_id INTEGER PRIMARY KEY, shard INTEGER, new_id INTEGER);')
+            conn.execute(f'''
+                INSERT INTO task_shards (old_id, shard, new_id)
+                SELECT task_id, {shard_of}, {shard_of}
+                    + {shards} * ROW_NUMBER() OVER (PARTITION BY {shard_of} ORDER BY task_id)
+                FROM (SELECT task_id, user_id FROM main.Tasks UNION ALL SELECT task_id, user_id FROM main.ArchivedTasks);
+            ''')
+            for k in range(shards):
+                for tasks, links, columns in (('Tasks', 'TaskTags', 'user_id, description, due_date, status'),
+                                              ('ArchivedTasks', 'ArchivedTaskTags',
+                                               'user_id, description, due_date, status, archived_at')):
+                    conn.execute(f'''
+                        INSERT INTO shard{k}.{tasks} (task_id, {columns})
+                        SELECT new_id, {columns}
+                        FROM main.{tasks} JOIN task_shards ON old_id = task_id WHERE shard = {k} ORDER BY new_id;
+                    ''')
+                    conn.execute(f'''
+                        INSERT INTO shard{k}.{links} (task_id, tag_id)
+                        SELECT new_id, tag_id FROM main.{links} JOIN task_shards ON old_id = task_id
+                        WHERE shard = {k} ORDER BY new_id, tag_id;
+                    ''')
+                conn.execute(f"INSERT INTO shard{k}.UserDetails SELECT * FROM main.UserDetails WHERE {shard_of} = {k};")
+            for table in ('TaskTags', 'Tasks', 'ArchivedTaskTags', 'ArchivedTasks', 'UserDetails'):
+                conn.execute(f"DELETE FROM main.{table};")
+            # The rows moved and tasks were renumbered, so change feed consumers must read everything again
+            for schema in ['main'] + [f"shard{k}" for k in range(shards)]:
+                conn.execute(f"DELETE FROM {schema}.ChangeLog;")
+                conn.execute(f"""UPDATE {schema}.ChangeLogHorizon SET seq = IFNULL(
+                                 (SELECT seq FROM {schema}.sqlite_sequence WHERE name = 'ChangeLog'), 0);""")
+            conn.executemany('INSERT INTO ShardFiles (shard, path) VALUES (?, ?);', enumerate(names))
+            conn.execute('DROP TABLE task_shards;')
+            conn.execute('COMMIT;')
+        except BaseException:
+            conn.execute('ROLLBACK;')
+            raise
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1';").fetchone():
+            conn.execute('ANALYZE;')  # give the shards the planner statistics the catalog had
+    finally:
+        conn.close()
+    return paths
+
+
+def copy_database(db_path, copy_path):
+    """
+    Copy a database, and its shard files if it is sharded, with SQLite's backup API.
+    The shard files keep their names, so copy_path must be in another directory.
+    """
+    source = sqlite3.connect(db_path)
+    try:
+        paths = [db_path]
+        if source.execute("SELECT 1 FROM sqlite_master WHERE name = 'ShardFiles';").fetchone():
+            paths += shard_paths(source, db_path)
+    finally:
+        source.close()
+    targets = [copy_path] + [os.path.join(os.path.dirname(copy_path), os.path.basename(path)) for path in paths[1:]]
+    if len(paths) > 1 and os.path.samefile(os.path.dirname(os.path.abspath(db_path)),
+                                           os.path.dirname(os.path.abspath(copy_path))):
+        raise ValueError("A sharded database must be copied to another directory")
+    for path, target in zip(paths, targets):
+        source, destination = sqlite3.connect(path), sqlite3.connect(target)
+        try:
+            source.backup(destination)
+        finally:
+            source.close()
+            destination.close()
+
+
+def create_db(db_path=DB_PATH, explain=False, shards=None):
+    try:
+        # Connect to the SQLite database
+        conn = sqlite3.connect(db_path)
+        # Enable foreign key constraints
+        conn.execute('PRAGMA foreign_keys = ON;')
+
+        if explain:
+            print("Query plans before migrating:")
+            check_query_plans(conn)
+
+        applied = migrate(conn)
+
+        if explain:
+            print("Query plans after migrating:")
+            check_query_plans(conn)
+
+        print(f"Database ready at schema version {schema_version(conn)} ({applied} migration(s) applied).")
         conn.close()
 
-        print("Database created successfully!")
+        if shards:
+            paths = shard_database(db_path, shards)
+            print(f"Tasks, user details and task tags split into {len(paths)} shard(s): {', '.join(paths)}")
 
-    except sqlite3.Error as e:
+    except (sqlite3.Error, ValueError) as e:
         print(f"Error occurred: {e}")
 
-create_db()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    create_db(explain='--explain' in args,
+              shards=int(args[args.index('--shards') + 1]) if '--shards' in args else None)
@@ -0,0 +1,133 @@
+"""
+Streaming export of users, user details, tasks, tags and task-tag links to CSV or JSONL.
+
+Usage:
+    python export.py tasks tasks.jsonl.gz
+    python export.py users users.csv
+    python export.py tasks - --format jsonl | jq .
+
+Rows are read from a single cursor over one consistent snapshot and written as
+they arrive, so memory use stays flat whatever the table size. Tasks include the
+IDs and names of their tags. A .gz suffix (or --gzip) compresses the output.
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+
+import sql
+
+# Query and column names per export kind. Tag lists are JSON arrays built by SQLite.
+EXPORTS = {
+    'users': ("SELECT user_id, name, email FROM Users ORDER BY user_id",
+              ('user_id', 'name', 'email')),
+    'user_details': ("SELECT user_id, phone, preferences, address FROM UserDetails ORDER BY user_id",
+                     ('user_id', 'phone', 'preferences', 'address')),
+    'tasks': ("""SELECT Tasks.task_id, Tasks.user_id, Tasks.description, Tasks.due_date, Tasks.status,
+                        (SELECT json_group_array(TaskTags.tag_id) FROM TaskTags
+                         WHERE TaskTags.task_id = Tasks.task_id),
+                        (SELECT json_group_array(Tags.name) FROM TaskTags JOIN Tags ON Tags.tag_id = TaskTags.tag_id
+                         WHERE TaskTags.task_id = Tasks.task_id)
+                 FROM Tasks ORDER BY Tasks.task_id""",
+              ('task_id', 'user_id', 'description', 'due_date', 'status', 'tag_ids', 'tags')),
+    'tags': ("SELECT tag_id, name FROM Tags ORDER BY tag_id",
+             ('tag_id', 'name')),
+    'task_tags': ("SELECT task_id, tag_id FROM TaskTags ORDER BY task_id, tag_id",
+                  ('task_id', 'tag_id')),
+}
+# Columns holding JSON arrays, decoded for JSONL and joined with ';' for CSV.
+LIST_COLUMNS = {'tag_ids', 'tags'}
+FETCH_SIZE = 1000
+
+
+def stream_rows(kind):
+    """
+    Yield every row of an export kind, fetching FETCH_SIZE rows at a time,
+    within one read transaction.
+    """
+    query, columns = EXPORTS[kind]
+    list_indexes = [i for i, column in enumerate(columns) if column in LIST_COLUMNS]
+    with sql.transaction() as conn:
+        cursor = conn.execute(query)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                if list_indexes:
+                    row = list(row)
+                    for i in list_indexes:
+                        row[i] = json.loads(row[i])
+                yield row
+
+
+def open_output(path, compress=None):
+    """
+    Open path for text writing, gzip-compressed if compress is set or path ends in .gz.
+    '-' means standard output.
+    """
+    if compress is None:
+        compress = path.endswith('.gz')
+    if path == '-':
+        if compress:
+            return io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'), encoding='utf-8', newline='')
+        return io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='', write_through=True)
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def export(kind, out, file_format='jsonl'):
+    """
+    Write every row of an export kind to the text stream out.
+
+    Returns:
+    int: The number of rows written.
+    """
+    columns = EXPORTS[kind][1]
+    count = 0
+    if file_format == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in stream_rows(kind):
+            writer.writerow(';'.join(map(str, value)) if isinstance(value, list) else value for value in row)
+            count += 1
+    else:
+        for row in stream_rows(kind):
+            out.write(json.dumps(dict(zip(columns, row))) + '\n')
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export TaskForce141 data to CSV or JSONL.")
+    parser.add_argument('kind', choices=sorted(EXPORTS))
+    parser.add_argument('path', help="output file, or - for standard output")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], dest='file_format',
+                        help="default: from the file extension, else jsonl")
+    parser.add_argument('--gzip', action='store_true', default=None, help="compress the output")
+    args = parser.parse_args(argv)
+
+    file_format = args.file_format or ('csv' if args.path.removesuffix('.gz').endswith('.csv') else 'jsonl')
+    start = time.perf_counter()
+    out = open_output(args.path, args.gzip)
+    try:
+        count = export(args.kind, out, file_format)
+    finally:
+        if out.buffer is sys.stdout.buffer:
+            out.flush()
+            out.detach()  # leave standard output open
+        else:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0
+    print(f"Exported {count} {args.kind} in {elapsed:.2f}s ({rate:,.0f} rows/sec)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Fill a database with synthetic users, user details, tasks, tags and task-tag links.
+
+Usage:
+    python generate_data.py --scale 10k                 # writes bench_10k.db
+    python generate_data.py --scale 1m --db todo_list.db
+    python generate_data.py --tasks 250000 --fresh
+    python generate_data.py --scale 1m --fresh --shards 4   # catalog plus 4 shard files
+
+Scales are named after the number of tasks; there is one user (with details)
+per 20 tasks, 200 tags and 0-3 tags per task. Data is deterministic for a given
+--seed, and rows are appended after any that already exist.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import create_db
+import sql
+from importer import chunked
+
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+TASKS_PER_USER = 20
+TAG_COUNT = 200
+MAX_TAGS_PER_TASK = 3
+STATUSES = ('Open', 'Open', 'In Progress', 'Complete')
+WORDS = (
+    'extract', 'secure', 'recon', 'brief', 'report', 'intel', 'convoy', 'perimeter', 'asset',
+    'debrief', 'satellite', 'uplink', 'gulag', 'safehouse', 'captain', 'soap', 'ghost', 'roach',
+    'overwatch', 'evac', 'supply', 'drop', 'patrol', 'checkpoint', 'radio', 'cipher', 'audit',
+)
+CHUNK_SIZE = 50_000
+
+
+def _max_id(conn, table, key):
+    return conn.execute(f"SELECT IFNULL(MAX({key}), 0) FROM {table}").fetchone()[0]
+
+
+def generate(task_count, seed=141, report=print):
+    """
+    Append task_count tasks, with matching users, details, tags and links, to the
+    configured database.
+
+    Returns:
+    dict: Number of rows inserted per table.
+    """
+    rng = random.Random(seed)
+    conn = sql.get_connection()
+    first_user = _max_id(conn, 'Users', 'user_id') + 1
+    first_task = _max_id(conn, 'Tasks', 'task_id') + 1
+    first_tag = _max_id(conn, 'Tags', 'tag_id') + 1
+    user_count = max(1, task_count // TASKS_PER_USER)
+    today = date.today()
+    counts = {}
+
+    def timed(table, writer, rows):
+        start = time.perf_counter()
+        inserted = 0
+        for chunk in chunked(rows, CHUNK_SIZE):
+            inserted += writer(chunk)
+        elapsed = time.perf_counter() - start
+        counts[table] = inserted
+        if report:
+            report(f"{table}: {inserted} rows in {elapsed:.1f}s ({inserted / elapsed if elapsed else 0:,.0f} rows/sec)")
+
+    timed('Users', sql.create_users_bulk,
+          ((f"Operator {n}", f"operator{n}@tf141.mil") for n in range(first_user, first_user + user_count)))
+
+    timed('UserDetails', sql.create_users_details_bulk,
+          ((n, f"+1-555-{n % 10000:04d}", rng.choice(('email', 'sms', 'radio')), f"{n} Base Road")
+           for n in range(first_user, first_user + user_count)))
+    timed('Tags', sql.create_tags_bulk, (f"tag-{n}" for n in range(first_tag, first_tag + TAG_COUNT)))
+    timed('Tasks', sql.create_tasks_bulk,
+          ((rng.randrange(first_user, first_user + user_count),
+            ' '.join(rng.choices(WORDS, k=rng.randint(3, 8))),
+            (today + timedelta(days=rng.randint(-365, 365))).isoformat(),
+            rng.choice(STATUSES))
+           for _ in range(task_count)))
+    # Read the new task IDs back, as a sharded database does not number tasks consecutively
+    timed('TaskTags', sql.create_task_tag_relations_bulk,
+          ((task_id, tag_id)
+           for task_id, *_ in sql.iter_tasks(after_id=first_task - 1)
+           for tag_id in rng.sample(range(first_tag, first_tag + TAG_COUNT), rng.randint(0, MAX_TAGS_PER_TASK))))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic TaskForce141 data.")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--scale', choices=sorted(SCALES), default='10k')
+    size.add_argument('--tasks', type=int, help="exact number of tasks to generate")
+    parser.add_argument('--db', help="database file (default: bench_<scale>.db)")
+    parser.add_argument('--fresh', action='store_true', help="delete the database file first")
+    parser.add_argument('--shards', type=int, help="split the database into this many shard files first")
+    parser.add_argument('--seed', type=int, default=141)
+    args = parser.parse_args(argv)
+
+    task_count = args.tasks or SCALES[args.scale]
+    db_path = args.db or f"bench_{args.scale if not args.tasks else args.tasks}.db"
+    if args.fresh:
+        stem, ext = os.path.splitext(db_path)
+        for path in [db_path] + [f"{stem}.shard{k}{ext or '.db'}" for k in range(10)]:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    if args.shards:
+        try:
+            create_db.shard_database(db_path, args.shards)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Bulk loading does not need every commit to be durable
+    sql.configure(db_path, synchronous='OFF')
+    start = time.perf_counter()
+    counts = generate(task_count, args.seed)
+    with sql.transaction() as conn:
+        conn.execute("ANALYZE")
+    print(f"Generated {sum(counts.values())} rows in {db_path} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Streaming bulk import of users, tasks, tags and task-tag links from CSV or JSONL files.
+
+Usage:
+    python importer.py tasks tasks.csv
+    python importer.py task_tags links.jsonl --chunk-size 20000
+
+CSV files need a header row; JSONL files hold one object per line. Rows are read
+and inserted in fixed-size chunks, one transaction per chunk, so memory use does
+not depend on the size of the file.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+import sql
+
+# Columns expected in the input for each kind, in the order the bulk writers take them.
+IMPORTS = {
+    'users': (('name', 'email'), sql.create_users_bulk),
+    'tasks': (('user_id', 'description', 'due_date', 'status'), sql.create_tasks_bulk),
+    'tags': (('name',), lambda rows: sql.create_tags_bulk(row[0] for row in rows)),
+    'task_tags': (('task_id', 'tag_id'), sql.create_task_tag_relations_bulk),
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def read_records(path, file_format=None):
+    """
+    Yield one dict per record in a CSV or JSONL file.
+    The format is taken from the file extension unless given explicitly.
+    Raises ValueError naming the file and line of a JSONL line that is not a JSON object.
+    """
+    if file_format is None:
+        file_format = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}, line {number}, column {e.colno}: {e.msg}") from None
+                if not isinstance(record, dict):
+                    raise ValueError(f"{path}, line {number}: expected a JSON object")
+                yield record
+
+
+def chunked(rows, size):
+    """
+    Yield lists of at most `size` rows from an iterable.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_file(kind, path, file_format=None, chunk_size=DEFAULT_CHUNK_SIZE, report=print):
+    """
+    Import a CSV/JSONL file into the table for `kind` in chunks of `chunk_size` rows.
+    A chunk that fails is rolled back whole (the writer reports why) and the import
+    carries on with the next one.
+
+    Returns:
+    tuple: (rows inserted, seconds elapsed, chunks that failed)
+    """
+    columns, writer = IMPORTS[kind]
+    rows = (tuple(record.get(column) for column in columns) for record in read_records(path, file_format))
+    inserted = failed = 0
+    start = time.perf_counter()
+    for chunk in chunked(rows, chunk_size):
+        written = writer(chunk)
+        inserted += written
+        if written < len(chunk):
+            failed += 1
+        elapsed = time.perf_counter() - start
+        if report:
+            report(f"{inserted} rows imported ({inserted / elapsed:,.0f} rows/sec)")
+    return inserted, time.perf_counter() - start, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import TaskForce141 data from CSV or JSONL.")
+    parser.add_argument('kind', choices=sorted(IMPORTS))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], dest='file_format')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    try:
+        inserted, elapsed, failed = import_file(args.kind, args.path, args.file_format, args.chunk_size)
+    except ValueError as e:
+        # Chunks before the bad line stay imported
+        print(f"Import stopped: {e}")
+        return 1
+    rate = inserted / elapsed if elapsed else 0
+    print(f"Imported {inserted} {args.kind} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    if failed:
+        print(f"{failed} chunk(s) of up to {args.chunk_size} rows failed and were not imported")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Load-test a running server.py instance and report requests/sec and latency percentiles.
+
+Usage:
+    python server.py --db bench_10k.db &
+    python loadtest.py --clients 16 --seconds 10
+    python loadtest.py --serve bench_10k.db --write-ratio 0.1   # start a server on a copy first
+
+Each client thread keeps one HTTP/1.1 keep-alive connection and sends a mix of
+GET requests (single rows, filtered task pages, searches, statistics) and, with
+--write-ratio, task creates and updates. Exits with status 1 if any request failed.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import create_db
+
+
+def _read_request(rng, ids):
+    max_user, max_task, max_tag = ids
+    return rng.choice((
+        lambda: ('GET', f"/tasks/{rng.randint(1, max_task)}"),
+        lambda: ('GET', f"/users/{rng.randint(1, max_user)}"),
+        lambda: ('GET', f"/tasks?user_id={rng.randint(1, max_user)}&status=Open&limit=50"),
+        lambda: ('GET', f"/tasks?tag_ids={rng.randint(1, max_tag)}&limit=50"),
+        lambda: ('GET', f"/tasks?after_id={rng.randint(0, max_task)}&limit=100"),
+        lambda: ('GET', f"/tasks/search?q={rng.choice(('soap', 'convoy', 'radio'))}"),
+        lambda: ('GET', "/stats"),
+    ))()
+
+
+def _write_request(rng, ids):
+    max_user, max_task, _ = ids
+    if rng.random() < 0.5:
+        body = {'user_id': rng.randint(1, max_user), 'description': "load test", 'due_date': "2030-01-01"}
+        return 'POST', "/tasks", body
+    body = {'user_id': rng.randint(1, max_user), 'description': "load test", 'due_date': "2030-06-01",
+            'status': "In Progress"}
+    return 'PUT', f"/tasks/{rng.randint(1, max_task)}", body
+
+
+def client(host, port, deadline, write_ratio, ids, seed, results):
+    """
+    Send requests on one keep-alive connection until the deadline and append
+    (latency ms, HTTP status or None on connection error) to results.
+    """
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    local = []
+    while time.perf_counter() < deadline:
+        if rng.random() < write_ratio:
+            method, path, body = _write_request(rng, ids)
+        else:
+            (method, path), body = _read_request(rng, ids), None
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=json.dumps(body) if body else None,
+                         headers={'Content-Type': 'application/json'} if body else {})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            status = None
+        local.append(((time.perf_counter() - start) * 1000, status))
+    conn.close()
+    results.extend(local)
+
+
+def _percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def _max_id(conn, collection):
+    """
+    Find the highest ID in a collection by bisecting on whether GET
+    /collection?after_id=N&limit=1 still returns a row.
+    """
+    def any_after(after_id):
+        conn.request('GET', f"/{collection}?after_id={after_id}&limit=1")
+        return bool(json.loads(conn.getresponse().read())['items'])
+
+    high = 1
+    while any_after(high):
+        high *= 2
+    low = high // 2  # any_after(low) is true unless the collection is (nearly) empty
+    while high - low > 1:
+        middle = (low + high) // 2
+        if any_after(middle):
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def _table_ids(host, port):
+    """
+    Return the (highest user ID, highest task ID, highest tag ID) of the server's database.
+    """
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        return tuple(_max_id(conn, collection) for collection in ('users', 'tasks', 'tags'))
+    finally:
+        conn.close()
+
+
+def _serve(db_path, tmp):
+    """
+    Start server.py on a copy of db_path on a free port and return (process, port).
+    """
+    copy_path = os.path.join(tmp, 'loadtest.db')
+    create_db.copy_database(db_path, copy_path)
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+    process = subprocess.Popen([sys.executable, server, '--db', copy_path, '--port', str(port)],
+                               stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("server did not start")
+
+
+def run(host, port, clients, seconds, write_ratio, seed=141):
+    """
+    Run the load test and print the results.
+
+    Returns:
+    int: The number of failed requests (5xx or connection errors).
+    """
+    ids = _table_ids(host, port)
+    results = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client, args=(host, port, deadline, write_ratio, ids, seed + n, results))
+               for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(ms for ms, _ in results)
+    failed = sum(1 for _, status in results if status is None or status >= 500)
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"{len(results)} requests from {clients} clients in {elapsed:.1f}s: {len(results) / elapsed:,.0f} req/s")
+    print(f"latency ms: p50 {_percentile(latencies, 50):.2f}  p90 {_percentile(latencies, 90):.2f}  "
+          f"p99 {_percentile(latencies, 99):.2f}  max {latencies[-1] if latencies else 0:.2f}")
+    print("status codes: " + ', '.join(f"{status or 'error'}: {count}" for status, count in sorted(
+        statuses.items(), key=lambda item: item[0] or 0)))
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the TaskForce141 JSON API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8141)
+    parser.add_argument('--serve', metavar='DB', help="start server.py on a temporary copy of this database")
+    parser.add_argument('--clients', type=int, default=8, help="concurrent keep-alive connections")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.0, help="fraction of requests that write")
+    args = parser.parse_args(argv)
+
+    if not args.serve:
+        return 1 if run(args.host, args.port, args.clients, args.seconds, args.write_ratio) else 0
+    with tempfile.TemporaryDirectory() as tmp:
+        process, port = _serve(args.serve, tmp)
+        try:
+            failed = run('127.0.0.1', port, args.clients, args.seconds, args.write_ratio)
+        finally:
+            process.terminate()
+            process.wait()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,40 +2,170 @@
 Enhanced Task Manager Application
 """
 
+import time
+_START = time.perf_counter()  # taken before any other import, for --startup-time
+
+import argparse
+import atexit
+import importlib.util
+import itertools
+import records
+import shutil
+import sys
 import sql
 import sqlite3
-from art import *
-from termcolor import colored
-import inquirer
-from prettytable import PrettyTable
-import sys
-import time
-from playsound import playsound
+from collections import deque
 from threading import Thread, Event
 from os import environ
 environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 
-import pygame  # it is important to import pygame after that
+
+def lazy_import(name):
+    """
+    Return a module that is only really imported on first attribute access.
+    Keeps start-up fast: UI libraries load when the first prompt or table needs them.
+    """
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+art = lazy_import('art')
+termcolor = lazy_import('termcolor')
+inquirer = lazy_import('inquirer')
+prettytable = lazy_import('prettytable')
+
+# Set to False by --no-sound / TASKFORCE_NO_SOUND; the mixer is only initialized when sound plays.
+SOUND_ENABLED = True
+_mixer_ready = False
 
 
 # Utility Functions
 def notify_user(message):
-    art = text2art(message)
-    print(colored(art, 'green'))
+    banner = art.text2art(message)
+    print(termcolor.colored(banner, 'green'))
+
+def remind_user(task):
+    notify_user("Task Due!")
+    print(f"Task {task.task_id}: {task.description} (due {task.due_date})")
+
+def parse_ids(text):
+    """Parse a comma separated list of integer IDs, raising ValueError on bad input."""
+    return [int(part) for part in text.split(',') if part.strip()]
 
 def table_printer(data, columns):
-    table = PrettyTable(columns)
-    if type(data) == tuple:
+    table = prettytable.PrettyTable(columns)
+    if type(data) == tuple or isinstance(data, records.Record):
         table.add_row(data)
     else:
         for row in data:
             table.add_row(row)
     print(table)
 
-# Initialize pygame mixer
-pygame.mixer.init()
+# Rows used to size the columns of a paged table, the widest a column may get before its
+# values are truncated, and how many pages back "previous" can go.
+TABLE_SAMPLE_SIZE = 100
+MAX_COLUMN_WIDTH = 60
+PAGE_HISTORY = 50
+
+def _column_widths(columns, sample, max_width):
+    widths = [
+        min(max(len(str(column)), *(len(str(row[i])) for row in sample)), max_width)
+        for i, column in enumerate(columns)
+    ]
+    # Shrink the widest columns until the table fits the terminal
+    room = shutil.get_terminal_size().columns - (3 * len(widths) + 1)
+    while sum(widths) > room and max(widths) > 8:
+        widest = widths.index(max(widths))
+        widths[widest] -= 1
+    return widths
+
+def page_printer(rows, columns, page_size=None, sample_size=TABLE_SAMPLE_SIZE, max_width=MAX_COLUMN_WIDTH):
+    """
+    Print rows from any iterable as a table, one terminal page at a time.
+
+    Column widths come from the first sample_size rows; longer values are truncated.
+    Rows are printed as they are read, and only the pages shown are kept, so an
+    iterator such as sql.iter_tasks() is never loaded whole. After each page the
+    user can go to the next or previous page or quit.
+
+    Returns:
+    int: The number of rows read.
+    """
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, sample_size))
+    if not sample:
+        return 0
+    widths = _column_widths(columns, sample, max_width)
+    page_size = page_size or max(5, shutil.get_terminal_size().lines - 7)
+
+    def line(values):
+        cells = []
+        for value, width in zip(values, widths):
+            text = ' '.join(str(value).split())
+            if len(text) > width:
+                text = text[:width - 1] + '…'
+            cells.append(text.ljust(width))
+        return '| ' + ' | '.join(cells) + ' |'
+
+    border = '+' + '+'.join('-' * (width + 2) for width in widths) + '+'
+    source = itertools.chain(sample, rows)
+    pages = deque(maxlen=PAGE_HISTORY)  # printed lines of the most recent pages
+    first_kept = 0  # page number of pages[0]
+    current = -1
+    count = 0
+    exhausted = False
+    while True:
+        if current + 1 - first_kept < len(pages):
+            current += 1
+            print('\n'.join([border, line(columns), border, *pages[current - first_kept], border]))
+        elif not exhausted:
+            first = next(source, None)
+            if first is None:
+                # The previous page ended exactly at the last row
+                exhausted = True
+                print("No more rows.")
+            else:
+                print('\n'.join([border, line(columns), border]))
+                page = []
+                for row in itertools.chain([first], itertools.islice(source, page_size - 1)):
+                    page.append(line(row))
+                    print(page[-1])
+                print(border)
+                count += len(page)
+                exhausted = len(page) < page_size
+                if len(pages) == pages.maxlen:
+                    first_kept += 1
+                pages.append(page)
+                current += 1
+        last = exhausted and current - first_kept == len(pages) - 1
+        if last and current == 0:
+            return count
+        choice = input(f"Page {current + 1}{' (last)' if last else ''} - "
+                       f"[Enter] next, [p] previous, [q] quit: ").strip().lower()
+        if choice == 'q':
+            return count
+        if choice == 'p':
+            if current - 1 < first_kept:
+                print("No earlier page available.")
+                current -= 1  # redisplay the current page
+            else:
+                current -= 2
+        elif last:
+            return count
 
 def play_sound(stop_event):
+    global _mixer_ready
+    import pygame  # imported here so that sessions without sound never load it
+    if not _mixer_ready:
+        pygame.mixer.init()
+        _mixer_ready = True
     pygame.mixer.music.load('media/typing.wav')
     pygame.mixer.music.play(-1)  # Loop the sound indefinitely
     while not stop_event.is_set():
@@ -44,21 +174,24 @@ def play_sound(stop_event):
 
 def typing_effect_with_sound(text, delay=0.05):
     stop_event = Event()
-    sound_thread = Thread(target=play_sound, args=(stop_event,))
-    sound_thread.start()
+    sound_thread = None
+    if SOUND_ENABLED:
+        sound_thread = Thread(target=play_sound, args=(stop_event,))
+        sound_thread.start()
     
     for char in text:
         print(char, end='', flush=True)
         time.sleep(delay)
     
     stop_event.set()
-    sound_thread.join()  # Ensure the sound thread finishes before exiting the function
+    if sound_thread:
+        sound_thread.join()  # Ensure the sound thread finishes before exiting the function
     print()
 
 # User Operations
 def user_operations():
     user_actions = [
-        "Create User", "Update User", "Delete User", 
+        "Create User", "Update User", "Delete User", "Purge User",
         "Fetch User", "Fetch All Users", "Back to Main Menu"
     ]
     while True:
@@ -100,6 +233,18 @@ def user_operations():
                 print(f"Error deleting user: {e}")
             else:
                 notify_user("User deleted!")
+        elif action == "Purge User":
+            try:
+                user_id = int(input("Enter user id: "))
+            except ValueError:
+                print("Invalid input. Please enter an integer for user ID.")
+                continue  # Go back to the beginning of the loop
+            confirm = input(f"Delete user {user_id} with their details and all their tasks? (y/N): ")
+            if confirm.strip().lower() != 'y':
+                continue
+            purged = sql.purge_user(user_id)
+            if purged is not None:
+                notify_user(f"User purged with {purged} task(s)!")
         elif action == "Fetch User":
             try:
                 user_id = int(input("Enter user id: "))
@@ -112,10 +257,7 @@ def user_operations():
             else:
                 print(f"No user found with ID {user_id}")
         elif action == "Fetch All Users":
-            users = sql.read_users()
-            if users:
-                table_printer(users, ['ID', 'Name', 'Email'])
-            else:
+            if not page_printer(sql.iter_users(), ['ID', 'Name', 'Email']):
                 print("No users found.")
 
 # User Details Operations
@@ -176,18 +318,27 @@ def user_details_operations():
             except ValueError:
                 print("Invalid input. Please enter an integer for user ID.")
         elif action == "Fetch All User Details":
-            users_details = sql.read_users_details()
-            if users_details:
-                table_printer(users_details, ['User ID', 'Phone', 'Preferences', 'Address'])
-            else:
+            if not page_printer(sql.iter_users_details(), ['User ID', 'Phone', 'Preferences', 'Address']):
                 print("No user details found.")
 
 # Task Operations
+SEARCH_LIMIT = 20  # best matches shown by Search Tasks
+
+def iter_tasks_matching(filters):
+    """Yield the tasks matching query_tasks() filters, reading sql.PAGE_SIZE rows per query."""
+    after_id = 0
+    while True:
+        tasks = sql.query_tasks(**filters, limit=sql.PAGE_SIZE, after_id=after_id)
+        yield from tasks
+        if len(tasks) < sql.PAGE_SIZE:
+            return
+        after_id = tasks[-1].task_id
+
 def task_operations():
     task_actions = [
         "Create Task", "Update Task", "Delete Task", 
-        "Fetch Task", "Fetch All Tasks", "Mark Task as Complete", 
-        "Back to Main Menu"
+        "Fetch Task", "Fetch All Tasks", "Search Tasks",
+        "Mark Task as Complete", "Archive Completed Tasks", "Back to Main Menu"
     ]
     while True:
         action = inquirer.prompt([inquirer.List("action", message="Task Operations", choices=task_actions)])['action']
@@ -241,11 +392,29 @@ def task_operations():
             except ValueError:
                 print("Invalid input. Please enter an integer for task ID.")
         elif action == "Fetch All Tasks":
-            tasks = sql.read_tasks()
+            print("Filter tasks (leave blank for any):")
+            try:
+                user_id = input("User id: ").strip()
+                tag_ids = parse_ids(input("Tag ids (comma separated): "))
+                filters = {
+                    'user_id': int(user_id) if user_id else None,
+                    'status': input("Status: ").strip() or None,
+                    'due_after': input("Due on or after (YYYY-MM-DD): ").strip() or None,
+                    'due_before': input("Due on or before (YYYY-MM-DD): ").strip() or None,
+                    'tag_ids': tag_ids or None,
+                }
+            except ValueError:
+                print("Invalid input. Please enter integers for user ID and tag IDs.")
+                continue
+            if not page_printer(iter_tasks_matching(filters), ['Task ID', 'User ID', 'Description', 'Due Date', 'Status']):
+                print("No tasks found.")
+        elif action == "Search Tasks":
+            query = input("Enter search words: ")
+            tasks = sql.search_tasks(query, SEARCH_LIMIT)
             if tasks:
                 table_printer(tasks, ['Task ID', 'User ID', 'Description', 'Due Date', 'Status'])
             else:
-                print("No tasks found.")
+                print(f"No tasks match '{query}'.")
         elif action == "Mark Task as Complete":
             try:
                 task_id = int(input("Enter task id: "))
@@ -256,6 +425,10 @@ def task_operations():
                 print(f"Error marking task as complete: {e}")
             else:
                 notify_user("Task marked as complete!")
+        elif action == "Archive Completed Tasks":
+            before = input("Archive completed tasks due before (YYYY-MM-DD): ").strip()
+            if before:
+                notify_user(f"{sql.archive_completed_tasks(before)} task(s) archived!")
 
 # Tag Operations
 def tag_operations():
@@ -307,10 +480,7 @@ def tag_operations():
             except ValueError:
                 print("Invalid input. Please enter an integer for tag ID.")
         elif action == "Fetch All Tags":
-            tags = sql.read_tags()
-            if tags:
-                table_printer(tags, ['Tag ID', 'Name'])
-            else:
+            if not page_printer(sql.iter_tags(), ['Tag ID', 'Name']):
                 print("No tags found.")
 
 # Task-Tag Relations Operations
@@ -318,7 +488,8 @@ def task_tag_relations_operations():
     task_tag_actions = [
         "Create Task Tag Relation", "Fetch Tags for Task",
         "Fetch Tasks for Tag", "remove_tag_from_task",
-        "Back to Main Menu"
+        "Remove Single Tag from Task", "Tag Tasks in Bulk",
+        "Untag Tasks in Bulk", "Back to Main Menu"
     ]
     while True:
         action = inquirer.prompt([inquirer.List("action", message="Tag Operations", choices=task_tag_actions)])['action']
@@ -338,13 +509,9 @@ def task_tag_relations_operations():
         elif action == "Fetch Tags for Task":
             try:
                 task_id = int(input("Enter task id: "))
-                tags = sql.read_tags_for_task(task_id)
+                tags = sql.read_tags_details_for_task(task_id)
                 if tags:
-                    table = PrettyTable(['Task ID', 'Tag ID', 'Tag Name'])
-                    for tag in tags:
-                        tag_details = sql.read_tag(tag)
-                        table.add_row([task_id, tag_details[0], tag_details[1]])
-                    print(table)
+                    table_printer([(task_id, *tag) for tag in tags], ['Task ID', 'Tag ID', 'Tag Name'])
                 else:
                     print(f"No tags found for task ID {task_id}")
             except ValueError:
@@ -352,14 +519,8 @@ def task_tag_relations_operations():
         elif action == "Fetch Tasks for Tag":
             try:
                 tag_id = int(input("Enter tag id: "))
-                tasks = sql.read_tasks_for_tag(tag_id)
-                if tasks:
-                    table = PrettyTable(['Task ID', 'User ID', 'Description', 'Due Date', 'Status'])
-                    for task in tasks:
-                        task_details = sql.read_task(task)
-                        table.add_row([task_details[0], task_details[1], task_details[2], task_details[3], task_details[4]])
-                    print(table)
-                else:
+                tasks = sql.read_tasks_details_for_tag(tag_id)
+                if not page_printer(tasks, ['Task ID', 'User ID', 'Description', 'Due Date', 'Status']):
                     print(f"No tasks found for tag ID {tag_id}")
             except ValueError:
                 print("Invalid input. Please enter an integer for tag ID.")
@@ -373,9 +534,71 @@ def task_tag_relations_operations():
                 print(f"Error unassigning tag from task: {e}")
             else:
                 notify_user("Tag unassigned from task!")
+        elif action == "Remove Single Tag from Task":
+            try:
+                task_id = int(input("Enter task id: "))
+                tag_id = int(input("Enter tag id: "))
+                sql.remove_tag_from_task(task_id, tag_id)
+            except ValueError:
+                print("Invalid input. Please enter integers for task ID and tag ID.")
+            except sqlite3.Error as e:
+                print(f"Error unassigning tag from task: {e}")
+            else:
+                notify_user("Tag unassigned from task!")
+        elif action in ("Tag Tasks in Bulk", "Untag Tasks in Bulk"):
+            try:
+                task_ids = parse_ids(input("Enter task ids (comma separated): "))
+                tag_ids = parse_ids(input("Enter tag ids (comma separated): "))
+                if action == "Tag Tasks in Bulk":
+                    count = sql.tag_tasks(task_ids, tag_ids)
+                else:
+                    count = sql.untag_tasks(task_ids, tag_ids)
+            except ValueError:
+                print("Invalid input. Please enter comma separated integers.")
+            except sqlite3.Error as e:
+                print(f"Error updating task tags: {e}")
+            else:
+                print(f"{count} task-tag relation(s) {'added' if action == 'Tag Tasks in Bulk' else 'removed'}.")
+
+# Statistics
+def statistics():
+    try:
+        user_id = input("Enter user id for per-user counts (leave blank to skip): ").strip()
+        stats = sql.task_stats(int(user_id) if user_id else None)
+    except ValueError:
+        print("Invalid input. Please enter an integer for user ID.")
+        return
+    if not stats:
+        return
+    table_printer((stats['total'], stats['open'], stats['overdue']), ['Total Tasks', 'Open', 'Overdue'])
+    if stats['by_status']:
+        table_printer(list(stats['by_status'].items()), ['Status', 'Tasks'])
+    if stats['by_tag']:
+        busiest = sorted(stats['by_tag'].items(), key=lambda item: item[1], reverse=True)[:10]
+        # Only the ten names shown are looked up, from the cache where possible
+        rows = [(tag_id, (sql.read_tag(tag_id) or (None, None))[1], count) for tag_id, count in busiest]
+        table_printer(rows, ['Tag ID', 'Tag Name', 'Tasks'])
+    if 'user' in stats:
+        table_printer((user_id, stats['user']['tasks'], stats['user']['open']), ['User ID', 'Tasks', 'Open'])
 
 # Main Function
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TaskForce141 task manager.")
+    parser.add_argument('--no-intro', action='store_true',
+                        help="skip the intro sequence (or set TASKFORCE_NO_INTRO=1)")
+    parser.add_argument('--no-sound', action='store_true',
+                        help="never initialize audio (or set TASKFORCE_NO_SOUND=1)")
+    parser.add_argument('--startup-time', action='store_true',
+                        help="print the time taken to get to the main menu and exit")
+    parser.add_argument('--profile', action='store_true',
+                        help="record sql.py call latencies and print a summary on exit")
+    parser.add_argument('--slow-ms', type=float, default=100.0,
+                        help="with --profile, log calls slower than this with their query plans")
+    parser.add_argument('--reminders', action='store_true',
+                        help="announce open tasks as their due dates arrive while the menu runs")
+    return parser.parse_args(argv)
+
+def intro():
     notify_user("Task Force 141")
     typing_effect_with_sound(">>> Welcome, Operator, to TaskForce141 <<<")
     typing_effect_with_sound("Mission Objective: Dominate your tasks with precision and speed.")
@@ -383,15 +606,42 @@ def main():
     typing_effect_with_sound("Intel HQ: https://github.com/0xDAG0N/TaskForce141")
     print()
 
+def main(argv=None):
+    global SOUND_ENABLED
+    args = parse_args(argv)
+    SOUND_ENABLED = not (args.no_sound or environ.get('TASKFORCE_NO_SOUND') == '1')
+    skip_intro = args.no_intro or args.startup_time or environ.get('TASKFORCE_NO_INTRO') == '1'
+
+    if args.profile:
+        import profiling
+        profiling.enable(slow_ms=args.slow_ms)
+        atexit.register(profiling.print_summary)
+
+    if not skip_intro:
+        intro()
+    sql.use_records()  # rows as records.Task etc., read by name below
+    sql.get_connection()  # open the database (and migrate it if needed) before the menu
+
+    if args.startup_time:
+        inquirer.List  # the first menu prompt needs inquirer, so count its import too
+        print(f"Startup time: {(time.perf_counter() - _START) * 1000:.1f} ms")
+        return
+
+    if args.reminders:
+        import reminders
+        scheduler = reminders.ReminderScheduler(callback=remind_user)
+        scheduler.start()
+        atexit.register(scheduler.stop)
+
     while True:
         main_actions = [
             "User Operations", "User Details Operations", 
             "Task Operations", "Tag Operations", 
-            "Task-Tag Relations Operations", "Exit"
+            "Task-Tag Relations Operations", "Statistics", "Exit"
         ]
         action = inquirer.prompt([inquirer.List("action", message="Main Menu", choices=main_actions)])['action']
         if action == "Exit":
-            print(text2art("Goodbye!"))
+            print(art.text2art("Goodbye!"))
             break
         elif action == "User Operations":
             user_operations()
@@ -403,6 +653,14 @@ def main():
             tag_operations()
         elif action == "Task-Tag Relations Operations":
             task_tag_relations_operations()
+        elif action == "Statistics":
+            statistics()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] in ('users', 'details', 'tasks', 'tags', 'changes', 'batch'):
+        import cli  # scriptable subcommands, see cli.py
+        sys.exit(cli.main(sys.argv[1:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        import server  # JSON API, see server.py
+        sys.exit(server.main(sys.argv[2:]))
+    main()
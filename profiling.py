@@ -0,0 +1,220 @@
+"""
+Opt-in instrumentation for the sql.py data layer.
+
+    import profiling
+    profiling.enable(slow_ms=50)
+    ...
+    profiling.print_summary()
+
+enable() wraps every public sql.py data function to count calls and record their
+latency in a histogram, and installs a trace callback on each connection to see
+the statements a call executes. Calls slower than slow_ms are logged (logger
+"taskforce141.sql") with each statement and its EXPLAIN QUERY PLAN.
+"""
+
+import inspect
+import logging
+import math
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+import sql
+
+logger = logging.getLogger('taskforce141.sql')
+
+# sql.py functions that manage connections or the cache rather than data.
+NOT_INSTRUMENTED = {
+    'configure', 'get_connection', 'add_connection_hook', 'remove_connection_hook',
+    'close_connection', 'close_all_connections', 'transaction', 'raise_errors',
+    'configure_cache', 'cache_stats', 'clear_cache', 'add_task_listener', 'remove_task_listener',
+    'use_records',
+}
+
+# Statements captured per call; executemany can trace thousands.
+MAX_STATEMENTS_PER_CALL = 20
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+
+def data_functions():
+    """
+    Return the names of the public sql.py functions that read or write data.
+    """
+    return sorted(
+        name for name, value in vars(sql).items()
+        if not name.startswith('_') and inspect.isfunction(value)
+        and value.__module__ == 'sql' and name not in NOT_INSTRUMENTED
+    )
+
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets (about 5% wide), so memory stays
+    constant however many calls are recorded.
+    """
+
+    BASE = 1.05
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms):
+        bucket = math.floor(math.log(max(ms, 1e-3) * 1000, self.BASE))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """
+        Return the p-th percentile in milliseconds (upper edge of its bucket).
+        """
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.BASE ** (bucket + 1) / 1000, self.max)
+        return self.max
+
+
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}
+_originals = {}
+slow_calls = deque(maxlen=100)
+_settings = {'slow_ms': 100.0, 'explain': True}
+
+
+def _trace(statement):
+    statements = getattr(_local, 'statements', None)
+    if statements is None or len(statements) >= MAX_STATEMENTS_PER_CALL or statement.startswith('--'):
+        return
+    # Statements run by triggers and virtual tables come with a "--" prefix before Python 3.11;
+    # from 3.11 on they repeat the expanded SQL of the statement that fired them, so skip repeats
+    if statements and statements[-1] == statement:
+        return
+    statements.append(statement)
+
+
+def _install_trace(conn):
+    conn.set_trace_callback(_trace)
+
+
+def _explain(statement):
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    try:
+        rows = sql.get_connection().execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+        return ' | '.join(row[-1] for row in rows)
+    except Exception as e:  # the statement may depend on state that no longer exists
+        return f"unavailable ({e})"
+
+
+def _instrument(name, function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        outer = getattr(_local, 'statements', None) is not None
+        if not outer:
+            _local.statements = []
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with _lock:
+                _histograms.setdefault(name, Histogram()).record(elapsed)
+            if not outer:
+                statements, _local.statements = _local.statements, None
+                if elapsed >= _settings['slow_ms']:
+                    _log_slow_call(name, elapsed, statements)
+    return wrapper
+
+
+def _log_slow_call(name, elapsed, statements):
+    plans = [(statement, _explain(statement) if _settings['explain'] else None) for statement in statements]
+    slow_calls.append({'function': name, 'ms': elapsed, 'statements': plans})
+    lines = [f"slow call: sql.{name} took {elapsed:.1f} ms"]
+    for statement, plan in plans:
+        lines.append(f"  {' '.join(statement.split())}")
+        if plan:
+            lines.append(f"    plan: {plan}")
+    logger.warning('\n'.join(lines))
+
+
+def enable(slow_ms=100.0, explain=True):
+    """
+    Start instrumenting sql.py. Calls taking at least slow_ms milliseconds are
+    logged with their statements and, if explain is set, their query plans.
+    """
+    _settings['slow_ms'] = slow_ms
+    _settings['explain'] = explain
+    if _originals:
+        return
+    for name in data_functions():
+        _originals[name] = getattr(sql, name)
+        setattr(sql, name, _instrument(name, _originals[name]))
+    sql.add_connection_hook(_install_trace)
+
+
+def disable():
+    """
+    Restore the original sql.py functions and stop tracing statements.
+    """
+    for name, function in _originals.items():
+        setattr(sql, name, function)
+    _originals.clear()
+    sql.remove_connection_hook(_install_trace)
+
+
+def reset():
+    """
+    Forget all recorded latencies and slow calls.
+    """
+    with _lock:
+        _histograms.clear()
+        slow_calls.clear()
+
+
+def stats():
+    """
+    Return {function name: {calls, total_ms, p50_ms, p90_ms, p99_ms, max_ms}}.
+    """
+    with _lock:
+        return {
+            name: {
+                'calls': histogram.count,
+                'total_ms': histogram.total,
+                'p50_ms': histogram.percentile(50),
+                'p90_ms': histogram.percentile(90),
+                'p99_ms': histogram.percentile(99),
+                'max_ms': histogram.max,
+            }
+            for name, histogram in _histograms.items()
+        }
+
+
+def summary():
+    """
+    Return a text table of per-function latencies, busiest functions first.
+    """
+    rows = sorted(stats().items(), key=lambda item: item[1]['total_ms'], reverse=True)
+    lines = [f"{'function':32} {'calls':>8} {'total ms':>10} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+    for name, s in rows:
+        lines.append(f"{name:32} {s['calls']:8} {s['total_ms']:10.1f} {s['p50_ms']:9.3f} "
+                     f"{s['p90_ms']:9.3f} {s['p99_ms']:9.3f} {s['max_ms']:9.3f}")
+    if slow_calls:
+        lines.append(f"{len(slow_calls)} slow call(s) over {_settings['slow_ms']} ms; slowest:")
+        for call in sorted(slow_calls, key=lambda call: call['ms'], reverse=True)[:5]:
+            lines.append(f"  sql.{call['function']}: {call['ms']:.1f} ms")
+    return '\n'.join(lines)
+
+
+def print_summary():
+    print(summary())
@@ -0,0 +1,179 @@
+"""
+Typed row records and a columnar fetch for the rows sql.py reads.
+
+Records are __slots__ classes, so a row costs about as much memory as the tuple
+it replaces, and fields read by name (task.due_date). They still index, unpack
+and compare like tuples, so code written against tuples keeps working. Turn them
+on with sql.use_records().
+
+to_columns() collects a result set into one container per column instead, for
+aggregating many rows: integer IDs go into array('q'), other values into lists.
+"""
+
+from array import array
+from functools import total_ordering
+from operator import attrgetter
+
+
+@total_ordering
+class Record:
+    """
+    Base of the row records. Subclasses set __slots__ to their column names, in table order.
+    """
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._values = attrgetter(*cls.__slots__)
+
+    def __iter__(self):
+        return iter(self._values(self))
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __getitem__(self, index):
+        return self._values(self)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, (Record, tuple)):
+            return tuple(self) < tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._values(self))
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={value!r}" for name, value in zip(self.__slots__, self))
+        return f"{type(self).__name__}({fields})"
+
+    def asdict(self):
+        """
+        Return the record as a {column: value} dict, e.g. for JSON.
+        """
+        return dict(zip(self.__slots__, self))
+
+
+class User(Record):
+    __slots__ = ('user_id', 'name', 'email')
+
+    def __init__(self, user_id, name, email):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+
+
+class UserDetails(Record):
+    __slots__ = ('user_id', 'phone', 'preferences', 'address')
+
+    def __init__(self, user_id, phone, preferences, address):
+        self.user_id = user_id
+        self.phone = phone
+        self.preferences = preferences
+        self.address = address
+
+
+class Task(Record):
+    __slots__ = ('task_id', 'user_id', 'description', 'due_date', 'status')
+
+    def __init__(self, task_id, user_id, description, due_date, status):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.description = description
+        self.due_date = due_date
+        self.status = status
+
+
+class ArchivedTask(Record):
+    __slots__ = ('task_id', 'user_id', 'description', 'due_date', 'status', 'archived_at')
+
+    def __init__(self, task_id, user_id, description, due_date, status, archived_at):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.description = description
+        self.due_date = due_date
+        self.status = status
+        self.archived_at = archived_at
+
+
+class Tag(Record):
+    __slots__ = ('tag_id', 'name')
+
+    def __init__(self, tag_id, name):
+        self.tag_id = tag_id
+        self.name = name
+
+
+# Record class per result column names; other results (counts, joins) stay tuples.
+RECORD_TYPES = {cls.__slots__: cls for cls in (User, UserDetails, Task, ArchivedTask, Tag)}
+
+# (cursor.description, record class) of the last row built. A statement keeps one
+# description object, so the column names are only looked up once per query.
+_last = (None, None)
+
+
+def row_factory(cursor, row):
+    """
+    sqlite3 row factory building the record whose columns the query selected,
+    or leaving the row a tuple if no record matches.
+    """
+    global _last
+    description, cls = _last
+    if cursor.description is not description:
+        description = cursor.description
+        cls = RECORD_TYPES.get(tuple(column[0] for column in description))
+        _last = (description, cls)
+    return row if cls is None else cls(*row)
+
+
+# Rows transposed at a time by to_columns().
+COLUMN_BATCH_SIZE = 10000
+
+
+def empty_columns(names):
+    """
+    Return the empty containers to_columns() fills: array('q') for *_id columns, lists for the rest.
+    """
+    return {name: array('q') if name.endswith('_id') else [] for name in names}
+
+
+def to_columns(names, cursor, batch_size=COLUMN_BATCH_SIZE):
+    """
+    Read the remaining rows of a cursor into one container per column, batch_size
+    rows at a time, so no list of row tuples is ever built.
+
+    Columns named *_id become array('q') (8 bytes a value; NULL is stored as 0,
+    which is never an ID). Other columns become lists in which equal values share
+    one object while the values read so far mostly repeat (statuses, dates), so
+    a repeated value costs one 8-byte reference.
+
+    Parameters:
+    names (tuple): The column names, in the order the query selects them.
+    cursor (sqlite3.Cursor): An executed cursor returning plain tuples.
+
+    Returns:
+    dict: {column name: array or list}, in the order of names.
+    """
+    columns = empty_columns(names)
+    interned = {name: {} for name in names if not name.endswith('_id')}
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return columns
+        for name, values in zip(names, zip(*batch)):
+            column = columns[name]
+            if isinstance(column, array):
+                column.extend((0 if value is None else value for value in values) if None in values else values)
+            elif name in interned:
+                seen = interned[name]
+                column.extend(map(seen.setdefault, values, values))
+                if len(seen) > len(column) // 2:
+                    del interned[name]  # mostly distinct, so the dict would cost more than it saves
+            else:
+                column.extend(values)
@@ -0,0 +1,206 @@
+"""
+Due-date reminders for open tasks.
+
+    import reminders
+
+    scheduler = reminders.ReminderScheduler(callback=lambda task: print("Due:", task[2]))
+    scheduler.start()
+    ...
+    scheduler.stop()
+
+A task is due when its due date (YYYY-MM-DD, optionally with a time) begins;
+lead moves every reminder earlier. Only deadlines still ahead when the scheduler
+starts are reminded, so starting it over a large backlog does not fire for every
+overdue task.
+
+The scheduler keeps a window of the next batch_size deadlines in a min-heap,
+read in due order from the partial index on open tasks, and sleeps on a
+condition until the earliest one. Tasks created, updated, completed or deleted
+through sql.py wake it through a task listener and adjust the heap in place;
+the window is only re-read once it is used up, after bulk inserts, and every
+resync_seconds to pick up changes made by other processes. Each task is
+re-read before its reminder fires, so a stale heap entry never reminds.
+"""
+
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+import sql
+
+
+def _deadline(due_date, lead):
+    """
+    Return the datetime a task with this due date is reminded at, or None if it has no valid date.
+    """
+    try:
+        return datetime.fromisoformat(due_date) - lead
+    except (TypeError, ValueError):
+        return None
+
+
+def print_reminder(task):
+    print(f"Reminder: task {task[0]} \"{task[2]}\" is due {task[3]}")
+
+
+class ReminderScheduler:
+    """
+    Background thread that calls callback(task) when an open task falls due.
+
+    Parameters:
+    callback (callable): Called with the (task_id, user_id, description, due_date, status)
+                         tuple of each due task, on the scheduler thread.
+    lead (timedelta): Remind this long before the due date begins.
+    batch_size (int): Number of upcoming deadlines kept in memory at once.
+    resync_seconds (float): Re-read the window this often; None to rely on task listeners only.
+    """
+
+    def __init__(self, callback=print_reminder, lead=timedelta(0), batch_size=1000, resync_seconds=600):
+        self.callback = callback
+        self.lead = lead
+        self.batch_size = batch_size
+        self.resync_seconds = resync_seconds
+        self._condition = threading.Condition()
+        self._heap = []          # (deadline, task_id), possibly with stale entries
+        self._scheduled = {}     # task_id: deadline of its live heap entry
+        self._horizon = None     # (due_date, task_id) of the last row read, if more rows may follow
+        self._watermark = None   # deadlines before this are never reminded
+        self._fired = set()      # tasks already reminded at exactly the watermark
+        self._resync_at = None
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        """
+        Start the scheduler thread and begin listening for task changes.
+        """
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._watermark = datetime.now()
+        self._resync_at = self._watermark
+        sql.add_task_listener(self._on_task_event)
+        self._thread = threading.Thread(target=self._run, name='taskforce141-reminders', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the scheduler thread; reminders that have not fired yet are dropped.
+        """
+        if self._thread is None:
+            return
+        sql.remove_task_listener(self._on_task_event)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def pending(self):
+        """
+        Return the number of reminders currently held in memory.
+        """
+        with self._condition:
+            return len(self._scheduled)
+
+    # The methods below run with self._condition held, except _run and _fire.
+
+    def _schedule(self, task_id, due_date):
+        deadline = _deadline(due_date, self.lead)
+        if deadline is None or deadline < self._watermark:
+            return
+        if deadline == self._watermark and task_id in self._fired:
+            return
+        if self._horizon is not None and (due_date, task_id) > self._horizon:
+            return  # beyond the window; read from the index when the window gets there
+        self._scheduled[task_id] = deadline
+        heapq.heappush(self._heap, (deadline, task_id))
+
+    def _load(self, reset=False):
+        """
+        Read the next batch of deadlines after the window, or the first batch when reset.
+        """
+        if reset:
+            self._heap.clear()
+            self._scheduled.clear()
+            start = ((self._watermark + self.lead).isoformat(' ', 'seconds'), 0)
+        else:
+            start = self._horizon
+        rows = sql.read_upcoming_tasks(*start, limit=self.batch_size)
+        self._horizon = None
+        for task_id, _, _, due_date, _ in rows:
+            self._schedule(task_id, due_date)
+        if len(rows) == self.batch_size:
+            self._horizon = (rows[-1][3], rows[-1][0])
+
+    def _on_task_event(self, event, task_id, due_date, status):
+        with self._condition:
+            if self._stopping:
+                return
+            if event == 'bulk':
+                self._resync_at = datetime.now()
+            else:
+                self._scheduled.pop(task_id, None)
+                if event in ('created', 'updated') and status != 'Complete':
+                    self._schedule(task_id, due_date)
+            self._condition.notify_all()
+
+    def _next_due(self):
+        """
+        Wait until a reminder is due and return its (deadline, task_id), or None when stopping.
+        """
+        with self._condition:
+            while not self._stopping:
+                now = datetime.now()
+                if self._resync_at is not None and now >= self._resync_at:
+                    self._load(reset=True)
+                    self._resync_at = now + timedelta(seconds=self.resync_seconds) if self.resync_seconds else None
+                while self._heap and self._scheduled.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)  # superseded by a later change
+                if not self._heap and self._horizon is not None:
+                    self._load()
+                    continue
+                if self._heap and self._heap[0][0] <= now:
+                    deadline, task_id = heapq.heappop(self._heap)
+                    del self._scheduled[task_id]
+                    if deadline > self._watermark:
+                        self._watermark = deadline
+                        self._fired.clear()
+                    self._fired.add(task_id)
+                    return deadline, task_id
+                wake = [t for t in (self._heap[0][0] if self._heap else None, self._resync_at) if t is not None]
+                self._condition.wait((min(wake) - now).total_seconds() if wake else None)
+            return None
+
+    def _run(self):
+        try:
+            while True:
+                due = self._next_due()
+                if due is None:
+                    break
+                self._fire(*due)
+        finally:
+            sql.close_connection()
+
+    def _fire(self, deadline, task_id):
+        # Read past the lookup cache, which does not see writes made by other processes
+        rows = sql.read_tasks_page(task_id - 1, 1)
+        task = rows[0] if rows and rows[0][0] == task_id else None
+        if task is None or task[4] == 'Complete':
+            return
+        if _deadline(task[3], self.lead) != deadline:
+            # Changed without this scheduler hearing of it, e.g. by another process
+            with self._condition:
+                self._schedule(task_id, task[3])
+            return
+        try:
+            self.callback(task)
+        except Exception as e:
+            print(f"Error in reminder callback for task {task_id}: {e}")
@@ -0,0 +1,404 @@
+"""
+Local HTTP/JSON API over the sql.py data layer.
+
+Usage:
+    python server.py --port 8141 --db todo_list.db
+    python main.py serve --port 8141
+
+    curl localhost:8141/tasks?status=Open&limit=50
+    curl -X POST localhost:8141/tasks -d '{"user_id": 1, "description": "Extract Soap", "due_date": "2025-01-31"}'
+
+Endpoints (ids are integers, bodies are JSON objects):
+    GET    /users  /details  /tags  /tasks        paginated lists
+    POST   /users  /details  /tags  /tasks        create
+    GET|PUT|DELETE /users/{id}  /details/{user_id}  /tags/{id}  /tasks/{id}
+    POST   /tasks/{id}/complete
+    GET    /tasks/search?q=words&limit=20
+    GET    /tasks/{id}/tags       /tags/{id}/tasks
+    PUT|DELETE /tasks/{id}/tags/{tag_id}
+    GET    /stats[?user_id=]
+    GET    /changes?cursor=&limit=        change log, see sql.changes_since()
+
+Lists return {"items": [...], "next_after_id": id or null}; pass next_after_id
+back as ?after_id= for the next page (limit defaults to 100, at most 1000).
+Only lists in ID order page this way: /tasks?order_by=due_date returns no
+next_after_id and rejects after_id.
+/tasks also takes the filters of sql.query_tasks(): user_id, status (repeatable),
+due_before, due_after, tag_ids (comma separated) and order_by.
+
+Requests are served by a fixed pool of worker threads. Each thread keeps its own
+sql.py connection, so the pool doubles as the connection pool. Connections are
+HTTP/1.1 keep-alive; a connection holds a worker until it closes or idles for
+--idle-timeout seconds.
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import sql
+from cli import CHANGE_COLUMNS, TAG_COLUMNS, TASK_COLUMNS, USER_COLUMNS, USER_DETAILS_COLUMNS
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class HTTPError(Exception):
+    """A request that cannot be served; status is the HTTP status code to answer with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ====================== Helpers ======================
+
+def _row(row, columns, what):
+    if row is None:
+        raise HTTPError(404, f"{what} not found")
+    return 200, dict(zip(columns, row))
+
+
+def _field(body, name, default=...):
+    if name in body:
+        if isinstance(body[name], (list, dict)):
+            raise HTTPError(400, f"'{name}' must be a string, number or null")
+        return body[name]
+    if default is ...:
+        raise HTTPError(400, f"missing field '{name}'")
+    return default
+
+
+def _int(query, name, default=None):
+    value = query.get(name, [None])[-1]
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(400, f"'{name}' must be an integer")
+
+
+def _limit(query, default=DEFAULT_LIMIT):
+    limit = _int(query, 'limit', default)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise HTTPError(400, f"'limit' must be between 1 and {MAX_LIMIT}")
+    return limit
+
+
+def _page(query):
+    return _int(query, 'after_id', 0), _limit(query)
+
+
+def _listing(rows, columns, limit, keyset=True):
+    # next_after_id is a key cursor, so lists in another order have none to give
+    return 200, {
+        'items': [dict(zip(columns, row)) for row in rows],
+        'next_after_id': rows[-1][0] if keyset and len(rows) == limit else None,
+    }
+
+
+def _created(column, new_id):
+    if new_id is None:
+        raise HTTPError(400, "nothing was created")
+    return 201, {column: new_id}
+
+
+def _exists(read, entity_id, what):
+    if read(entity_id) is None:
+        raise HTTPError(404, f"{what} {entity_id} not found")
+
+
+# ====================== Handlers ======================
+# Each handler takes (path ids, query dict, JSON body) and returns (status, payload).
+
+def list_tasks(ids, query, body):
+    after_id, limit = _page(query)
+    order_by = query.get('order_by', ['task_id'])[-1]
+    keyset = order_by == 'task_id'
+    if after_id and not keyset:
+        raise HTTPError(400, "'after_id' requires order_by=task_id")
+    tag_ids = query.get('tag_ids', [''])[-1]
+    try:
+        rows = sql.query_tasks(
+            user_id=_int(query, 'user_id'), status=query.get('status'),
+            due_before=query.get('due_before', [None])[-1], due_after=query.get('due_after', [None])[-1],
+            tag_ids=[int(tag_id) for tag_id in tag_ids.split(',') if tag_id.strip()] or None,
+            order_by=order_by, limit=limit, after_id=after_id if keyset else None,
+        )
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    return _listing(rows, TASK_COLUMNS, limit, keyset)
+
+
+def search_tasks(ids, query, body):
+    text = query.get('q', [''])[-1]
+    raw = query.get('raw', ['0'])[-1] == '1'
+    try:
+        rows = sql.search_tasks(text, _limit(query, 20), raw=raw)
+    except sqlite3.OperationalError as e:
+        if not raw or sql._is_busy(e):
+            raise
+        raise HTTPError(400, f"invalid search query: {e}")
+    return 200, {'items': [dict(zip(TASK_COLUMNS, row)) for row in rows], 'next_after_id': None}
+
+
+def update_task(ids, query, body):
+    _exists(sql.read_task, ids[0], "Task")
+    sql.update_task(_field(body, 'user_id'), _field(body, 'description'), _field(body, 'due_date'),
+                    _field(body, 'status'), ids[0])
+    return _row(sql.read_task(ids[0]), TASK_COLUMNS, "Task")
+
+
+def complete_task(ids, query, body):
+    _exists(sql.read_task, ids[0], "Task")
+    sql.mark_task_as_complete(ids[0])
+    return _row(sql.read_task(ids[0]), TASK_COLUMNS, "Task")
+
+
+def update_user(ids, query, body):
+    _exists(sql.read_user, ids[0], "User")
+    sql.update_user(ids[0], _field(body, 'name'), _field(body, 'email'))
+    return _row(sql.read_user(ids[0]), USER_COLUMNS, "User")
+
+
+def create_user_details(ids, query, body):
+    user_id = _field(body, 'user_id')
+    sql.create_user_details(user_id, _field(body, 'phone', ''), _field(body, 'preferences', ''),
+                            _field(body, 'address', ''))
+    status, payload = _row(sql.read_user_details(user_id), USER_DETAILS_COLUMNS, "User details")
+    return 201, payload
+
+
+def update_user_details(ids, query, body):
+    _exists(sql.read_user_details, ids[0], "Details for user")
+    sql.update_user_details(ids[0], _field(body, 'phone'), _field(body, 'preferences'), _field(body, 'address'))
+    return _row(sql.read_user_details(ids[0]), USER_DETAILS_COLUMNS, "User details")
+
+
+def update_tag(ids, query, body):
+    _exists(sql.read_tag, ids[0], "Tag")
+    sql.update_tag(ids[0], _field(body, 'name'))
+    return _row(sql.read_tag(ids[0]), TAG_COLUMNS, "Tag")
+
+
+def deleter(read, delete, what):
+    """Build a DELETE handler that answers 404 for a missing row and 204 otherwise."""
+    def handler(ids, query, body):
+        _exists(read, ids[0], what)
+        delete(ids[0])
+        return 204, None
+    return handler
+
+
+def list_changes(ids, query, body):
+    try:
+        changes, cursor = sql.changes_since(query.get('cursor', [None])[-1] or None, _limit(query))
+    except sql.ChangeCursorExpired as e:
+        raise HTTPError(410, str(e))  # compacted away: the client must read everything again
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    return 200, {'items': [dict(zip(CHANGE_COLUMNS, change)) for change in changes], 'cursor': cursor}
+
+
+def lister(read_page, columns):
+    """Build a handler for a keyset-paginated list."""
+    def handler(ids, query, body):
+        after_id, limit = _page(query)
+        return _listing(read_page(after_id, limit), columns, limit)
+    return handler
+
+
+def related(read, columns):
+    """Build a handler listing the rows related to one id, e.g. the tags of a task."""
+    def handler(ids, query, body):
+        return 200, {'items': [dict(zip(columns, row)) for row in read(ids[0])], 'next_after_id': None}
+    return handler
+
+
+def task_tag(change):
+    """Build a handler that adds or removes the task-tag link named by the path."""
+    def handler(ids, query, body):
+        change(*ids)
+        return 204, None
+    return handler
+
+
+ROUTES = [
+    ('GET', r'/users', lister(sql.read_users_page, USER_COLUMNS)),
+    ('POST', r'/users', lambda ids, q, b: _created('user_id', sql.create_user(_field(b, 'name'), _field(b, 'email')))),
+    ('GET', r'/users/(\d+)', lambda ids, q, b: _row(sql.read_user(ids[0]), USER_COLUMNS, "User")),
+    ('PUT', r'/users/(\d+)', update_user),
+    ('DELETE', r'/users/(\d+)', deleter(sql.read_user, sql.delete_user, "User")),
+
+    ('GET', r'/details', lister(sql.read_users_details_page, USER_DETAILS_COLUMNS)),
+    ('POST', r'/details', create_user_details),
+    ('GET', r'/details/(\d+)', lambda ids, q, b: _row(sql.read_user_details(ids[0]), USER_DETAILS_COLUMNS,
+                                                       "User details")),
+    ('PUT', r'/details/(\d+)', update_user_details),
+    ('DELETE', r'/details/(\d+)', deleter(sql.read_user_details, sql.delete_user_details, "Details for user")),
+
+    ('GET', r'/tasks', list_tasks),
+    ('POST', r'/tasks', lambda ids, q, b: _created('task_id', sql.create_task(
+        _field(b, 'user_id'), _field(b, 'description'), _field(b, 'due_date', None), _field(b, 'status', 'Open')))),
+    ('GET', r'/tasks/search', search_tasks),
+    ('GET', r'/tasks/(\d+)', lambda ids, q, b: _row(sql.read_task(ids[0]), TASK_COLUMNS, "Task")),
+    ('PUT', r'/tasks/(\d+)', update_task),
+    ('DELETE', r'/tasks/(\d+)', deleter(sql.read_task, sql.delete_task, "Task")),
+    ('POST', r'/tasks/(\d+)/complete', complete_task),
+    ('GET', r'/tasks/(\d+)/tags', related(sql.read_tags_details_for_task, TAG_COLUMNS)),
+    ('PUT', r'/tasks/(\d+)/tags/(\d+)', task_tag(sql.create_task_tag_relation)),
+    ('DELETE', r'/tasks/(\d+)/tags/(\d+)', task_tag(sql.remove_tag_from_task)),
+
+    ('GET', r'/tags', lister(sql.read_tags_page, TAG_COLUMNS)),
+    ('POST', r'/tags', lambda ids, q, b: _created('tag_id', sql.create_tag(_field(b, 'name')))),
+    ('GET', r'/tags/(\d+)', lambda ids, q, b: _row(sql.read_tag(ids[0]), TAG_COLUMNS, "Tag")),
+    ('PUT', r'/tags/(\d+)', update_tag),
+    ('DELETE', r'/tags/(\d+)', deleter(sql.read_tag, sql.delete_tag, "Tag")),
+    ('GET', r'/tags/(\d+)/tasks', related(sql.read_tasks_details_for_tag, TASK_COLUMNS)),
+
+    ('GET', r'/stats', lambda ids, q, b: (200, sql.task_stats(_int(q, 'user_id')))),
+    ('GET', r'/changes', list_changes),
+]
+_ROUTES = [(method, re.compile(pattern + '/?'), handler) for method, pattern, handler in ROUTES]
+
+
+def dispatch(method, path, query, body):
+    """
+    Run the handler routed to by method and path inside sql.raise_errors().
+
+    Returns:
+    tuple: (HTTP status, JSON-serializable payload or None)
+    """
+    allowed = False
+    for route_method, pattern, handler in _ROUTES:
+        match = pattern.fullmatch(path)
+        if not match:
+            continue
+        if route_method != method:
+            allowed = True
+            continue
+        try:
+            with sql.raise_errors():
+                return handler([int(group) for group in match.groups()], query, body)
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except ValueError as e:  # e.g. a non-integer user_id in a sharded database
+            return 400, {'error': str(e)}
+        except sqlite3.IntegrityError as e:
+            return 409, {'error': str(e)}
+        except sqlite3.Error as e:
+            return (503 if sql._is_busy(e) else 500), {'error': str(e)}
+    if allowed:
+        return 405, {'error': f"{method} not allowed on {path}"}
+    return 404, {'error': f"no such endpoint: {path}"}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    server_version = 'TaskForce141'
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        body = {}
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # the body's end is unknown, so the next request's start is too
+            self._send(400, {'error': "invalid Content-Length header"})
+            return
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length))
+            except ValueError:
+                self._send(400, {'error': "body is not valid JSON"})
+                return
+            if not isinstance(body, dict):
+                self._send(400, {'error': "body must be a JSON object"})
+                return
+        status, payload = dispatch(self.command, url.path, parse_qs(url.query), body)
+        self._send(status, payload)
+
+    def _send(self, status, payload):
+        data = b'' if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTP server handing each connection to a fixed pool of worker threads, so the
+    threads' sql.py connections are reused from request to request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, workers=16, idle_timeout=5.0, verbose=False):
+        handler = type('Handler', (RequestHandler,), {'timeout': idle_timeout})
+        super().__init__(address, handler)
+        self.verbose = verbose
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='taskforce141-http')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._work, request, client_address)
+
+    def _work(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+        sql.close_all_connections()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the TaskForce141 database as a JSON API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8141)
+    parser.add_argument('--db', help="database file (default: sql.DB_PATH)")
+    parser.add_argument('--workers', type=int, default=16, help="worker threads, i.e. pooled connections")
+    parser.add_argument('--idle-timeout', type=float, default=5.0,
+                        help="seconds before an idle keep-alive connection is closed")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        sql.configure(args.db)
+    sql.get_connection()  # migrate before accepting requests
+    server = PooledHTTPServer((args.host, args.port), args.workers, args.idle_timeout, args.verbose)
+    print(f"Serving {sql.DB_PATH} on http://{args.host}:{server.server_port} with {args.workers} workers",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,496 @@
+import atexit
+import heapq
+import itertools
+import json
+import os
+import random
 import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from functools import wraps
+import cache
 import create_db
+import records
+
+# Database file used by every connection handed out by get_connection().
+DB_PATH = 'todo_list.db'
+
+# Pragmas applied once, when a connection is opened. Negative cache_size is in KiB.
+PRAGMAS = {
+    'foreign_keys': 'ON',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,
+    'busy_timeout': 5000,  # ms to wait for another connection's lock before failing
+}
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+_migrated_paths = set()
+# Callables run with each newly opened connection, see add_connection_hook().
+_connection_hooks = []
+
+
+def configure(db_path=None, **pragmas):
+    """
+    Change the database path and/or pragma settings used for new connections.
+
+    Open connections are closed so the next get_connection() call in each thread
+    reopens with the new settings, e.g. configure(synchronous='FULL', cache_size=-64000).
+    """
+    global DB_PATH
+    if db_path is not None:
+        DB_PATH = db_path
+        _cache.clear()
+    PRAGMAS.update(pragmas)
+    close_all_connections()
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Connection whose `with` blocks nest.
+
+    The outermost block begins a transaction and commits or rolls it back on
+    exit. Inner blocks run in savepoints, so a failing inner block only undoes
+    its own work and many sql.py calls can share one transaction().
+    Lookup cache entries of rows written inside a block are dropped once the
+    outermost block commits, see _invalidate().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.depth = 0
+        self.shards = 0  # number of attached shards, see _attach_shards()
+        self.pending_invalidations = set()  # cache keys to drop on commit
+
+    def __enter__(self):
+        if self.depth:
+            self.execute(f"SAVEPOINT sp{self.depth}")
+        elif not self.in_transaction:
+            self.execute("BEGIN")
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.depth -= 1
+        if not self.depth:
+            pending, self.pending_invalidations = self.pending_invalidations, set()
+            result = super().__exit__(exc_type, exc_value, traceback)
+            if exc_type is None:
+                for key in pending:
+                    _cache.invalidate(key)
+            return result
+        if exc_type is not None:
+            self.execute(f"ROLLBACK TO sp{self.depth}")
+        self.execute(f"RELEASE sp{self.depth}")
+        return False
 
 
 def get_connection():
     """
-    Function to connect to the database and enable foreign key constraints.
+    Return the calling thread's connection to the database, opening it on first use.
+
+    The connection is reused across calls and its pragmas are only set once.
+    Use it as `with get_connection() as conn:` to commit or roll back; the
+    connection itself stays open until close_connection() or interpreter exit.
     """
-    conn = sqlite3.connect('todo_list.db')
-    conn.execute('PRAGMA foreign_keys = ON;')  # Enable foreign key constraints
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=PooledConnection)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    if DB_PATH not in _migrated_paths:
+        # Bring the schema up to date once per database per process
+        create_db.migrate(conn)
+        for path in create_db.shard_paths(conn, DB_PATH):
+            _check_shard_file(path)
+            shard = sqlite3.connect(path)
+            try:
+                create_db.migrate(shard, create_db.SHARD_MIGRATIONS)
+            finally:
+                shard.close()
+        _migrated_paths.add(DB_PATH)
+    paths = create_db.shard_paths(conn, DB_PATH)
+    if paths:
+        _attach_shards(conn, paths)
+    for hook in _connection_hooks:
+        hook(conn)
+    _local.conn = conn
+    _local.generation = _generation
+    with _connections_lock:
+        _connections.append(conn)
     return conn
 
+
+def add_connection_hook(hook):
+    """
+    Call hook(conn) on every connection opened from now on, e.g. to install a
+    trace callback. Open connections are closed so that they pick it up too.
+    """
+    _connection_hooks.append(hook)
+    close_all_connections()
+
+
+def remove_connection_hook(hook):
+    """
+    Stop calling a hook added with add_connection_hook() on new connections.
+    """
+    if hook in _connection_hooks:
+        _connection_hooks.remove(hook)
+        close_all_connections()
+
+
+def _records_hook(conn):
+    conn.row_factory = records.row_factory
+
+
+def use_records(enabled=True):
+    """
+    Make the readers return records.Task, User, UserDetails, Tag and ArchivedTask
+    objects (task.due_date, still indexable like tuples) instead of plain tuples,
+    on every connection; use_records(False) switches back. Cached rows are dropped.
+    """
+    if enabled and _records_hook not in _connection_hooks:
+        add_connection_hook(_records_hook)
+    elif not enabled:
+        remove_connection_hook(_records_hook)
+    _cache.clear()
+
+
+def close_connection():
+    """
+    Close the calling thread's connection, if it has one.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.conn = None
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    conn.close()
+
+
+def close_all_connections():
+    """
+    Close every connection opened by get_connection(), in any thread.
+    """
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+atexit.register(close_all_connections)
+
+
+@contextmanager
+def transaction():
+    """
+    Run every sql.py call made inside the block in one transaction on the calling
+    thread's connection, committed once at the end (or rolled back on error).
+    """
+    with get_connection() as conn:
+        yield conn
+
+
+@contextmanager
+def raise_errors():
+    """
+    Make sql.py functions called inside the block re-raise sqlite3 errors instead
+    of printing them, so callers such as batch scripts can tell a call failed.
+    """
+    _local.raise_errors = getattr(_local, 'raise_errors', 0) + 1
+    try:
+        yield
+    finally:
+        _local.raise_errors -= 1
+
+
+# Calls made outside a transaction that still fail on lock contention after busy_timeout
+# are retried up to RETRIES times, sleeping a random time of up to RETRY_BASE_DELAY * 2**attempt
+# (at most RETRY_MAX_DELAY) seconds in between, so competing processes do not retry in step.
+RETRIES = 5
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 2.0
+
+
+def _is_busy(error):
+    """
+    Return True if a sqlite3 error means the database was locked by another connection.
+    """
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+
+def _retry_busy(function):
+    """
+    Retry a sql.py call that failed because the database was locked.
+
+    Only the outermost call is retried: inside a transaction() the work done so far
+    would be lost, so the error goes to whoever owns the transaction.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'retrying', False) or get_connection().in_transaction:
+            return function(*args, **kwargs)
+        for attempt in range(RETRIES):
+            _local.retrying = True
+            try:
+                return function(*args, **kwargs)
+            except sqlite3.Error as e:
+                if not _is_busy(e):
+                    raise
+            finally:
+                _local.retrying = False
+            time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+        return function(*args, **kwargs)  # last attempt; errors are reported as usual
+    return wrapper
+
+
+# ====================== Shards ======================
+
+# A sharded database (create_db.py --shards N) keeps Users and Tags in DB_PATH, the
+# catalog, and the Tasks, UserDetails and TaskTags rows of each user in shard
+# user_id % N, a separate file with its own write lock. Every connection attaches
+# the shards as shard0..shardN-1 and shadows the sharded tables with TEMP views
+# over all of them, so reads see one database; writes name their shard's table,
+# see _shard(). Task IDs are allocated so that task_id % N is the task's shard.
+# Each shard keeps its own counter tables, so the same key can have a row per shard
+# and readers sum them.
+SHARDED_TABLES = (
+    'Tasks', 'UserDetails', 'TaskTags', 'ArchivedTasks', 'ArchivedTaskTags',
+    'TaskStatusCounts', 'UserTaskCounts', 'TagTaskCounts', 'OpenTaskDueCounts',
+)
+# Pragmas that apply per attached database rather than per connection.
+SHARD_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size')
+
+_FOREIGN_KEY_FAILED = "SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed');"
+
+
+def _check_shard_file(path):
+    """
+    Refuse to open a sharded database with a missing shard, which ATTACH would silently create empty.
+    """
+    if not os.path.exists(path):
+        raise sqlite3.OperationalError(f"Shard file {path} is missing")
+
+
+def _attach_shards(conn, paths):
+    """
+    Attach the shard files to a new connection and create the TEMP views that
+    union them and the TEMP triggers that stand in for the foreign keys between
+    the shards and the catalog, which SQLite cannot enforce across files.
+    """
+    schemas = [f"shard{k}" for k in range(len(paths))]
+    for schema, path in zip(schemas, paths):
+        _check_shard_file(path)
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        for name in SHARD_PRAGMAS:
+            if name in PRAGMAS:
+                conn.execute(f"PRAGMA {schema}.{name} = {PRAGMAS[name]};")
+    for table in SHARDED_TABLES:
+        union = " UNION ALL ".join(f"SELECT * FROM {schema}.{table}" for schema in schemas)
+        conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+    for schema in schemas:
+        user_missing = "new.user_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM main.Users WHERE user_id = new.user_id)"
+        for table in ('Tasks', 'UserDetails'):
+            for event in ('INSERT', 'UPDATE OF user_id'):
+                conn.execute(f"""CREATE TEMP TRIGGER {schema}_{table}_{event.split()[0].lower()}_user
+                                 BEFORE {event} ON {schema}.{table} WHEN {user_missing}
+                                 BEGIN {_FOREIGN_KEY_FAILED} END""")
+        conn.execute(f"""CREATE TEMP TRIGGER {schema}_tasktags_insert_tag BEFORE INSERT ON {schema}.TaskTags
+                         WHEN new.tag_id IS NOT NULL
+                         AND NOT EXISTS (SELECT 1 FROM main.Tags WHERE tag_id = new.tag_id)
+                         BEGIN {_FOREIGN_KEY_FAILED} END""")
+    conn.execute(f"""CREATE TEMP TRIGGER users_delete_sharded BEFORE DELETE ON main.Users
+                     WHEN EXISTS (SELECT 1 FROM temp.Tasks WHERE user_id = old.user_id)
+                     OR EXISTS (SELECT 1 FROM temp.UserDetails WHERE user_id = old.user_id)
+                     BEGIN {_FOREIGN_KEY_FAILED} END""")
+    conn.execute(f"""CREATE TEMP TRIGGER tags_delete_sharded BEFORE DELETE ON main.Tags
+                     WHEN EXISTS (SELECT 1 FROM temp.TaskTags WHERE tag_id = old.tag_id)
+                     BEGIN {_FOREIGN_KEY_FAILED} END""")
+    conn.shards = len(paths)
+
+
+def _shard(conn, key):
+    """
+    Return the schema holding the rows for a user_id (new rows) or task_id
+    (existing tasks and their tags): 'main' unless the database is sharded.
+    Tasks without a user go to shard 0.
+    """
+    if not conn.shards:
+        return 'main'
+    try:
+        return f"shard{int(key or 0) % conn.shards}"
+    except (TypeError, ValueError):
+        raise ValueError(f"ID must be an integer, not {key!r}") from None
+
+
+def _schemas(conn):
+    """
+    Return every schema holding sharded tables, for statements run on each shard.
+    """
+    return [f"shard{k}" for k in range(conn.shards)] if conn.shards else ['main']
+
+
+def _new_task_id(conn, schema):
+    """
+    Return the SQL expression for the task_id of a task inserted into schema: past
+    the highest live or archived ID, so archived IDs are not handed out again, and
+    when sharded the next ID that maps back to the same shard.
+    """
+    first, step = (schema[len('shard'):], conn.shards) if conn.shards else (0, 1)
+    return (f"(MAX(IFNULL((SELECT MAX(task_id) FROM {schema}.Tasks), {first}), "
+            f"IFNULL((SELECT MAX(task_id) FROM {schema}.ArchivedTasks), {first})) + {step})")
+
+
+def _by_shard(conn, rows, key_index):
+    """
+    Group rows by the schema of their row[key_index] (a user_id or task_id), in
+    shard order: writers that lock shards in the same order cannot deadlock.
+    When unsharded, rows are passed through as they are, so generators stay lazy.
+    """
+    if not conn.shards:
+        return {'main': rows}
+    groups = {}
+    for row in rows:
+        groups.setdefault(_shard(conn, row[key_index]), []).append(row)
+    return dict(sorted(groups.items()))
+
+
+# ====================== Cache ======================
+
+# Read-through cache for the single-row read_user/read_user_details/read_task/read_tag
+# lookups, keyed on (table, id). Writes through sql.py invalidate their entry; use a
+# ttl when other processes write to the same database.
+_cache = cache.LRUCache(maxsize=4096)
+
+
+def configure_cache(maxsize=None, ttl=None):
+    """
+    Resize the lookup cache and/or set its time-to-live in seconds.
+    maxsize=0 disables caching and ttl=0 removes the time limit.
+    """
+    _cache.resize(maxsize, ttl)
+
+
+def cache_stats():
+    """
+    Return the lookup cache's hit/miss/eviction counters and size, e.g. to size it.
+    """
+    return _cache.stats()
+
+
+def clear_cache():
+    """
+    Drop every cached row and reset the counters.
+    """
+    _cache.clear()
+
+
+def _invalidate(*keys):
+    """
+    Drop the cache entries of rows just written. Inside an open transaction the
+    write is not committed yet, and another thread could cache the old row again
+    in between, so the keys are dropped when the outermost block commits instead.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and conn.depth:
+        conn.pending_invalidations.update(keys)
+        return
+    for key in keys:
+        _cache.invalidate(key)
+
+
+def _cached(table):
+    """
+    Serve a read_<entity>(id) function through the lookup cache.
+    Rows that are not found are not cached, so a later insert is seen right away.
+    A row read while a write to any row was being invalidated is not cached, as it
+    may predate that write; nor is a row this thread wrote in an uncommitted transaction.
+    """
+    def decorator(read):
+        @wraps(read)
+        def wrapper(entity_id):
+            key = (table, entity_id)
+            conn = getattr(_local, 'conn', None)
+            if conn is not None and key in conn.pending_invalidations:
+                return read(entity_id)
+            row = _cache.get(key)
+            if row is None:
+                generation = _cache.generation
+                row = read(entity_id)
+                if row is not None:
+                    _cache.put(key, row, generation)
+            return row
+        return wrapper
+    return decorator
+
+
+def _report_error(message):
+    """
+    Print a database error message, or re-raise the exception being handled when
+    called inside raise_errors(), or when it is lock contention _retry_busy() will retry.
+    """
+    if getattr(_local, 'raise_errors', 0):
+        raise
+    if getattr(_local, 'retrying', False) and _is_busy(sys.exc_info()[1]):
+        raise
+    print(message)
+
+# ====================== Paging ======================
+
+# Default number of rows per page for the read_*_page and iter_* functions.
+PAGE_SIZE = 500
+
+
+@_retry_busy
+def _read_page(table, key, after_id, limit):
+    """
+    Read up to `limit` rows of `table` whose primary key `key` is greater than
+    `after_id`, in key order. Keyset paging keeps every page an index seek,
+    however deep into the table it is.
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute(
+                f"SELECT * FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?", (after_id, limit)
+            )
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _report_error(f"Error reading {table}: {e}")
+        return []
+
+
+def _iter_table(table, key, page_size, after_id=0):
+    """
+    Yield every row of `table` in key order, fetching `page_size` rows at a time.
+    """
+    while True:
+        page = _read_page(table, key, after_id, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after_id = page[-1][0]
+
 # ====================== User ======================
 
+@_retry_busy
 def read_users():
     """
     Read all users from the Users table.
@@ -21,9 +500,25 @@ def read_users():
             cursor = conn.execute("SELECT * FROM Users")
             return cursor.fetchall()
     except sqlite3.Error as e:
-        print(f"Error reading users: {e}")
+        _report_error(f"Error reading users: {e}")
         return []
 
+def read_users_page(after_id=0, limit=PAGE_SIZE):
+    """
+    Read the next page of users whose user_id is greater than after_id.
+    Pass the user_id of the last row of a page to get the following one.
+    """
+    return _read_page("Users", "user_id", after_id, limit)
+
+
+def iter_users(page_size=PAGE_SIZE, after_id=0):
+    """
+    Yield users one at a time in user_id order, reading page_size rows per query.
+    """
+    return _iter_table("Users", "user_id", page_size, after_id)
+
+@_cached("Users")
+@_retry_busy
 def read_user(user_id):
     """
     Read a specific user from the Users table based on user_id.
@@ -33,9 +528,10 @@ def read_user(user_id):
             cursor = conn.execute("SELECT * FROM Users WHERE user_id = ?", (user_id,))
             return cursor.fetchone()
     except sqlite3.Error as e:
-        print(f"Error reading user: {e}")
+        _report_error(f"Error reading user: {e}")
         return None
 
+@_retry_busy
 def create_user(name, email):
     """
     Create a new user in the Users table."""
@@ -44,48 +540,134 @@ def create_user(name, email):
             cursor = conn.execute("INSERT INTO Users (name, email) VALUES (?, ?)", (name, email))
             return cursor.lastrowid
     except sqlite3.Error as e:
-        print(f"Error creating user: {e}")
+        _report_error(f"Error creating user: {e}")
         return None
 
+@_retry_busy
+def create_users_bulk(users):
+    """
+    Insert many users in a single transaction.
+
+    Parameters:
+    users (iterable): (name, email) tuples. May be a generator.
+
+    Returns:
+    int: The number of users inserted, or 0 on error (nothing is inserted).
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.executemany("INSERT INTO Users (name, email) VALUES (?, ?)", users)
+            return cursor.rowcount
+    except sqlite3.Error as e:
+        _report_error(f"Error creating users: {e}")
+        return 0
+
+@_retry_busy
 def update_user(user_id, name, email):
     """
     Update user details in the Users table based on user"""
     try:
         with get_connection() as conn:
             conn.execute("UPDATE Users SET name = ?, email = ? WHERE user_id = ?", (name, email, user_id))
-            conn.commit()
+        _invalidate(("Users", user_id))
     except sqlite3.Error as e:
-        print(f"Error updating user: {e}")
+        _report_error(f"Error updating user: {e}")
 
+@_retry_busy
 def delete_user(user_id):
     """
     Delete user from the Users table based on user_id."""
     try:
         with get_connection() as conn:
             conn.execute("DELETE FROM Users WHERE user_id = ?", (user_id,))
-            conn.commit()
+        _invalidate(("Users", user_id))
     except sqlite3.IntegrityError as e:
-        print(f"Cannot delete user due to associated records: {e}")
+        _report_error(f"Cannot delete user due to associated records (purge_user deletes them too): {e}")
+    except sqlite3.Error as e:
+        _report_error(f"Error deleting user: {e}")
+
+@_retry_busy
+def purge_user(user_id):
+    """
+    Delete a user together with their details, tasks, archived tasks and the
+    tags links of both, in one transaction of a few set-based statements.
+
+    Returns:
+    int: The number of tasks deleted (live and archived), or None on error (nothing is deleted).
+    """
+    try:
+        with get_connection() as conn:
+            task_ids, archived = [], 0
+            for schema in _schemas(conn):  # a task given to another user stays in its shard
+                task_ids += [row[0] for row in conn.execute(
+                    f"SELECT task_id FROM {schema}.Tasks WHERE user_id = ?", (user_id,))]
+                for tasks, links in (('Tasks', 'TaskTags'), ('ArchivedTasks', 'ArchivedTaskTags')):
+                    conn.execute(
+                        f"""DELETE FROM {schema}.{links}
+                            WHERE task_id IN (SELECT task_id FROM {schema}.{tasks} WHERE user_id = ?)""",
+                        (user_id,)
+                    )
+                archived += conn.execute(f"DELETE FROM {schema}.ArchivedTasks WHERE user_id = ?", (user_id,)).rowcount
+                conn.execute(f"DELETE FROM {schema}.Tasks WHERE user_id = ?", (user_id,))
+            conn.execute(f"DELETE FROM {_shard(conn, user_id)}.UserDetails WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM main.Users WHERE user_id = ?", (user_id,))
     except sqlite3.Error as e:
-        print(f"Error deleting user: {e}")
+        _report_error(f"Error purging user: {e}")
+        return None
+    _invalidate(("Users", user_id))
+    _invalidate(("UserDetails", user_id))
+    for task_id in task_ids:
+        _invalidate(("Tasks", task_id))
+        _notify_task_listeners('deleted', task_id)
+    return len(task_ids) + archived
 
 # ====================== UserDetails ======================
 
-def create_user_details(phone, preferences, address):
+@_retry_busy
+def create_user_details(user_id, phone, preferences, address):
     """
     Create user details in the UserDetails table based on user_id."""
     try:
         with get_connection() as conn:
             conn.execute(
-                "INSERT INTO UserDetails (phone, preferences, address) VALUES (?, ?, ?)",
-                (phone, preferences, address)
+                f"INSERT INTO {_shard(conn, user_id)}.UserDetails (user_id, phone, preferences, address) "
+                "VALUES (?, ?, ?, ?)",
+                (user_id, phone, preferences, address)
+            )
+    except sqlite3.IntegrityError as e:
+        _report_error(f"Error: Foreign key constraint failed - {e}")
+    except sqlite3.Error as e:
+        _report_error(f"Error creating user details: {e}")
+
+@_retry_busy
+def create_users_details_bulk(users_details):
+    """
+    Insert many user details rows in a single transaction.
+
+    Parameters:
+    users_details (iterable): (user_id, phone, preferences, address) tuples. May be a generator.
+
+    Returns:
+    int: The number of rows inserted, or 0 on error (nothing is inserted).
+    """
+    try:
+        with get_connection() as conn:
+            return sum(
+                conn.executemany(
+                    f"INSERT INTO {schema}.UserDetails (user_id, phone, preferences, address) VALUES (?, ?, ?, ?)",
+                    rows
+                ).rowcount
+                for schema, rows in _by_shard(conn, users_details, 0).items()
             )
-            conn.commit()
     except sqlite3.IntegrityError as e:
-        print(f"Error: Foreign key constraint failed - {e}")
+        _report_error(f"Error: Foreign key constraint failed - {e}")
+        return 0
     except sqlite3.Error as e:
-        print(f"Error creating user details: {e}")
+        _report_error(f"Error creating user details: {e}")
+        return 0
 
+@_cached("UserDetails")
+@_retry_busy
 def read_user_details(user_id):
     """
     Read user details from the UserDetails table based on user_id."""
@@ -94,9 +676,10 @@ def read_user_details(user_id):
             cursor = conn.execute("SELECT * FROM UserDetails WHERE user_id = ?", (user_id,))
             return cursor.fetchone()
     except sqlite3.Error as e:
-        print(f"Error reading user details: {e}")
+        _report_error(f"Error reading user details: {e}")
         return None
     
+@_retry_busy
 def read_users_details():
     """
     Read all user details from the UserDetails table."""
@@ -106,20 +689,36 @@ def read_users_details():
             users_details = cursor.fetchall()
             return users_details
     except sqlite3.Error as e:
-        print(f"Error reading user details: {e}")
-        return None
+        _report_error(f"Error reading user details: {e}")
+        return []
+
+def read_users_details_page(after_id=0, limit=PAGE_SIZE):
+    """
+    Read the next page of user details whose user_id is greater than after_id.
+    Pass the user_id of the last row of a page to get the following one.
+    """
+    return _read_page("UserDetails", "user_id", after_id, limit)
+
+
+def iter_users_details(page_size=PAGE_SIZE, after_id=0):
+    """
+    Yield user details one at a time in user_id order, reading page_size rows per query.
+    """
+    return _iter_table("UserDetails", "user_id", page_size, after_id)
 
+@_retry_busy
 def update_user_details(user_id, phone, preferences, address):
     """
     Update user details in the UserDetails table based on user_id."""
     try:
         with get_connection() as conn:
-            conn.execute("UPDATE UserDetails Set phone = ?, preferences = ?, address = ? WHERE user_id = ?", (phone, preferences, address, user_id))
-            conn.commit()
+            conn.execute(f"UPDATE {_shard(conn, user_id)}.UserDetails Set phone = ?, preferences = ?, address = ? WHERE user_id = ?", (phone, preferences, address, user_id))
+        _invalidate(("UserDetails", user_id))
     except sqlite3.Error as e:
-        print(f"Error updating user details: {e}")
+        _report_error(f"Error updating user details: {e}")
 
 
+@_retry_busy
 def delete_user_details(user_id):
     """
     Delete user details from the UserDetails table based on user_id.
@@ -131,91 +730,415 @@ def delete_user_details(user_id):
     None
     """
     try:
-        conn = get_connection()
-        conn.execute("DELETE FROM UserDetails WHERE user_id = ?", (user_id,))
-        conn.commit()
-    except Exception as e:
-        print(f"An error occurred: {e}")
-    finally:
-        conn.close()
+        with get_connection() as conn:
+            conn.execute(f"DELETE FROM {_shard(conn, user_id)}.UserDetails WHERE user_id = ?", (user_id,))
+        _invalidate(("UserDetails", user_id))
+    except sqlite3.Error as e:
+        _report_error(f"Error deleting user details: {e}")
 
 # ====================== Tasks ======================
 
+# Callables told about single-task writes, see add_task_listener().
+_task_listeners = []
+
+
+def add_task_listener(listener):
+    """
+    Call listener(event, task_id, due_date, status) after each task write made
+    through this module, so in-memory views such as reminders.py stay current.
+
+    event is 'created', 'updated', 'completed', 'deleted' or 'archived'; due_date and
+    status are the new values where known. Bulk inserts report ('bulk', None, None, None).
+    Listeners run in the writing thread, possibly before the transaction commits.
+    """
+    _task_listeners.append(listener)
+
+
+def remove_task_listener(listener):
+    """
+    Stop calling a listener added with add_task_listener().
+    """
+    if listener in _task_listeners:
+        _task_listeners.remove(listener)
+
+
+def _notify_task_listeners(event, task_id, due_date=None, status=None):
+    for listener in list(_task_listeners):
+        listener(event, task_id, due_date, status)
+
+
+@_retry_busy
 def create_task(user_id, description, due_date, status):
     """
     Create a new task in the Tasks table
     """
     try:
         with get_connection() as conn:
-            conn.execute(
-                "INSERT INTO Tasks (user_id, description, due_date, status) VALUES (?, ?, ?, ?)",
+            schema = _shard(conn, user_id)
+            cursor = conn.execute(
+                f"INSERT INTO {schema}.Tasks (task_id, user_id, description, due_date, status) "
+                f"VALUES ({_new_task_id(conn, schema)}, ?, ?, ?, ?)",
                 ( user_id, description, due_date, status)
             )
-            conn.commit()
+        _notify_task_listeners('created', cursor.lastrowid, due_date, status)
+        return cursor.lastrowid
+    except sqlite3.IntegrityError as e:
+        _report_error(f"Error: Foreign key constraint failed - {e}")
+    except sqlite3.Error as e:
+        _report_error(f"Error creating task: {e}")
+
+@_retry_busy
+def create_tasks_bulk(tasks):
+    """
+    Insert many tasks in a single transaction.
+
+    Parameters:
+    tasks (iterable): (user_id, description, due_date, status) tuples. May be a generator.
+
+    Returns:
+    int: The number of tasks inserted, or 0 on error (nothing is inserted).
+    """
+    try:
+        with get_connection() as conn:
+            count = sum(
+                conn.executemany(
+                    f"INSERT INTO {schema}.Tasks (task_id, user_id, description, due_date, status) "
+                    f"VALUES ({_new_task_id(conn, schema)}, ?, ?, ?, ?)",
+                    rows
+                ).rowcount
+                for schema, rows in _by_shard(conn, tasks, 0).items()
+            )
+        _notify_task_listeners('bulk', None)
+        return count
     except sqlite3.IntegrityError as e:
-        print(f"Error: Foreign key constraint failed - {e}")
+        _report_error(f"Error: Foreign key constraint failed - {e}")
+        return 0
     except sqlite3.Error as e:
-        print(f"Error creating task: {e}")
+        _report_error(f"Error creating tasks: {e}")
+        return 0
 
+@_retry_busy
 def read_tasks():
     """
     Read all tasks from the Tasks table."""
-    with get_connection() as conn:
-        cursor = conn.execute("SELECT * FROM Tasks")
-        tasks = cursor.fetchall()
-    return tasks
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute("SELECT * FROM Tasks")
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _report_error(f"Error reading tasks: {e}")
+        return []
+
+def read_tasks_page(after_id=0, limit=PAGE_SIZE):
+    """
+    Read the next page of tasks whose task_id is greater than after_id.
+    Pass the task_id of the last row of a page to get the following one.
+    """
+    return _read_page("Tasks", "task_id", after_id, limit)
+
+
+def iter_tasks(page_size=PAGE_SIZE, after_id=0):
+    """
+    Yield tasks one at a time in task_id order, reading page_size rows per query.
+    """
+    return _iter_table("Tasks", "task_id", page_size, after_id)
 
+@_cached("Tasks")
+@_retry_busy
 def read_task(task_id):
     """
     Read a specific task from the Tasks table based on task_id."""
-    with get_connection() as conn:
-        cursor = conn.execute("SELECT * FROM Tasks WHERE task_id = ?",(task_id,))
-        task = cursor.fetchone()
-    return task
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute("SELECT * FROM Tasks WHERE task_id = ?",(task_id,))
+            return cursor.fetchone()
+    except sqlite3.Error as e:
+        _report_error(f"Error reading task: {e}")
+        return None
 
+@_retry_busy
 def update_task(user_id,description, due_date, status, task_id):
     """
     Update a task in the Tasks table based on task_id."""
-    with get_connection() as conn:
-        conn.execute("UPDATE Tasks SET user_id = ?, description = ?, due_date = ?, status = ? WHERE task_id = ?", (user_id, description, due_date, status, task_id))
-        conn.commit()
+    try:
+        with get_connection() as conn:
+            # A task stays in its shard when it is given to another user
+            conn.execute(f"UPDATE {_shard(conn, task_id)}.Tasks SET user_id = ?, description = ?, due_date = ?, status = ? WHERE task_id = ?", (user_id, description, due_date, status, task_id))
+        _invalidate(("Tasks", task_id))
+        _notify_task_listeners('updated', task_id, due_date, status)
+    except sqlite3.IntegrityError as e:
+        _report_error(f"Error: Foreign key constraint failed - {e}")
+    except sqlite3.Error as e:
+        _report_error(f"Error updating task: {e}")
 
+@_retry_busy
 def delete_task(task_id):
     """
     Delete a task from the Tasks table based on task_id."""
-    with get_connection() as conn:
-        conn.execute("DELETE FROM Tasks WHERE task_id = ?", (task_id,))
-        conn.commit()
-
-def mark_task_as_complete(task_id):
-    """
-    Mark a task as complete in the Tasks table based on task_id."""
-    with get_connection() as conn:
-        conn.execute("UPDATE Tasks SET status = 'Complete' WHERE task_id = ?", (task_id,))
-        conn.commit()
-
-# ====================== Tags ======================
+    try:
+        with get_connection() as conn:
+            conn.execute(f"DELETE FROM {_shard(conn, task_id)}.Tasks WHERE task_id = ?", (task_id,))
+        _invalidate(("Tasks", task_id))
+        _notify_task_listeners('deleted', task_id)
+    except sqlite3.IntegrityError as e:
+        _report_error(f"Cannot delete task due to associated records: {e}")
+    except sqlite3.Error as e:
+        _report_error(f"Error deleting task: {e}")
 
-def create_tag(name):
+@_retry_busy
+def purge_tasks(task_ids):
     """
-    Create a new tag in the Tags table.
+    Delete tasks, live or archived, together with their tag links, in one
+    transaction of a few set-based statements.
 
     Parameters:
-    name (str): The name of the tag to be created.
+    task_ids (list): IDs of the tasks to delete.
 
     Returns:
-    None
+    int: The number of tasks deleted, or 0 on error (nothing is deleted).
     """
+    task_ids = list(task_ids)
     try:
-        conn = get_connection()
-        conn.execute("INSERT INTO Tags (name) VALUES (?)", (name,))
-        conn.commit()
-    except Exception as e:
-        print(f"An error occurred: {e}")
-    finally:
-        conn.close()
+        with get_connection() as conn:
+            count = 0
+            for schema, rows in _by_shard(conn, [(task_id,) for task_id in task_ids], 0).items():
+                batch = json.dumps([task_id for (task_id,) in rows])
+                for table in ('TaskTags', 'Tasks', 'ArchivedTaskTags', 'ArchivedTasks'):
+                    deleted = conn.execute(
+                        f"DELETE FROM {schema}.{table} WHERE task_id IN (SELECT value FROM json_each(?))", (batch,)
+                    ).rowcount
+                    if table in ('Tasks', 'ArchivedTasks'):
+                        count += deleted
+    except sqlite3.Error as e:
+        _report_error(f"Error purging tasks: {e}")
+        return 0
+    for task_id in task_ids:
+        _invalidate(("Tasks", task_id))
+        _notify_task_listeners('deleted', task_id)
+    return count
 
-def read_tags():
+@_retry_busy
+def mark_task_as_complete(task_id):
+    """
+    Mark a task as complete in the Tasks table based on task_id."""
+    try:
+        with get_connection() as conn:
+            conn.execute(f"UPDATE {_shard(conn, task_id)}.Tasks SET status = 'Complete' WHERE task_id = ?", (task_id,))
+        _invalidate(("Tasks", task_id))
+        _notify_task_listeners('completed', task_id, status='Complete')
+    except sqlite3.Error as e:
+        _report_error(f"Error marking task as complete: {e}")
+
+@_retry_busy
+def read_upcoming_tasks(after_due_date='', after_id=0, limit=PAGE_SIZE):
+    """
+    Read the next open (not 'Complete') tasks in (due_date, task_id) order, starting
+    after the given position, from the partial index on open tasks' due dates.
+    Tasks without a due date are skipped.
+
+    Returns:
+    list: Up to limit (task_id, user_id, description, due_date, status) tuples.
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute(
+                """SELECT * FROM Tasks WHERE status IS NOT 'Complete' AND (due_date, task_id) > (?, ?)
+                   ORDER BY due_date, task_id LIMIT ?""",
+                (after_due_date, after_id, limit)
+            )
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _report_error(f"Error reading upcoming tasks: {e}")
+        return []
+
+# Columns query_tasks() may sort by; prefix with '-' for descending order.
+TASK_ORDER_COLUMNS = ('task_id', 'user_id', 'due_date', 'status')
+
+
+def _task_query(columns, user_id, status, due_before, due_after, tag_ids, order_by, limit, after_id):
+    """
+    Build the SELECT of columns from Tasks for the query_tasks() filters.
+
+    Returns:
+    tuple: (query, params)
+    """
+    column = order_by.lstrip('-')
+    if column not in TASK_ORDER_COLUMNS:
+        raise ValueError(f"Cannot order tasks by {order_by!r}")
+    direction = 'DESC' if order_by.startswith('-') else 'ASC'
+
+    clauses, params = [], []
+    if user_id is not None:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if isinstance(status, str):
+        clauses.append("status = ?")
+        params.append(status)
+    elif status:
+        clauses.append(f"status IN ({', '.join('?' * len(status))})")
+        params.extend(status)
+    if due_after is not None:
+        clauses.append("due_date >= ?")
+        params.append(due_after)
+    if due_before is not None:
+        clauses.append("due_date <= ?")
+        params.append(due_before)
+    if tag_ids:
+        clauses.append(f"task_id IN (SELECT task_id FROM TaskTags WHERE tag_id IN ({', '.join('?' * len(tag_ids))}))")
+        params.extend(tag_ids)
+    if after_id is not None:
+        clauses.append("task_id > ?")
+        params.append(after_id)
+
+    query = f"SELECT {columns} FROM Tasks"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += f" ORDER BY {column} {direction}"
+    if column != 'task_id':
+        query += f", task_id {direction}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+
+@_retry_busy
+def query_tasks(user_id=None, status=None, due_before=None, due_after=None, tag_ids=None,
+                order_by='task_id', limit=None, after_id=None):
+    """
+    Read the tasks matching every given filter with one parameterized query,
+    so the filtering is done by SQLite using the Tasks indexes.
+
+    Parameters:
+    user_id (int): Only tasks of this user.
+    status (str or list): Only tasks with this status, or any of these statuses.
+    due_before (str): Only tasks due on or before this date (YYYY-MM-DD).
+    due_after (str): Only tasks due on or after this date (YYYY-MM-DD).
+    tag_ids (list): Only tasks carrying at least one of these tags.
+    order_by (str): One of TASK_ORDER_COLUMNS, '-' prefixed for descending.
+    limit (int): Maximum number of tasks returned.
+    after_id (int): Only tasks with a larger task_id, for keyset paging by task_id.
+
+    Returns:
+    list: Matching (task_id, user_id, description, due_date, status) tuples.
+    """
+    query, params = _task_query('*', user_id, status, due_before, due_after, tag_ids, order_by, limit, after_id)
+    try:
+        with get_connection() as conn:
+            return conn.execute(query, params).fetchall()
+    except sqlite3.Error as e:
+        _report_error(f"Error querying tasks: {e}")
+        return []
+
+@_retry_busy
+def query_task_columns(columns=records.Task.__slots__, user_id=None, status=None, due_before=None,
+                       due_after=None, tag_ids=None, order_by='task_id', limit=None, after_id=None):
+    """
+    Read the tasks matching the query_tasks() filters column by column, for
+    aggregating many tasks: each column is one compact array or list instead of
+    a tuple per row (see records.to_columns()), e.g.
+    Counter(query_task_columns(['status'])['status']).
+
+    Parameters:
+    columns (list): The Tasks columns to read; leave out description unless needed.
+    The other parameters are those of query_tasks().
+
+    Returns:
+    dict: {column: array('q') of IDs (NULL as 0) or list of values}; empty columns on error.
+    """
+    columns = tuple(columns)
+    unknown = set(columns) - set(records.Task.__slots__)
+    if unknown or not columns:
+        raise ValueError(f"Cannot read task columns {sorted(unknown) or columns!r}")
+    query, params = _task_query(', '.join(columns), user_id, status, due_before, due_after, tag_ids,
+                                order_by, limit, after_id)
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            return records.to_columns(columns, cursor.execute(query, params))
+    except sqlite3.Error as e:
+        _report_error(f"Error querying task columns: {e}")
+        return records.empty_columns(columns)
+
+@_retry_busy
+def search_tasks(query, limit=20, raw=False):
+    """
+    Full-text search over task descriptions, best matches first.
+
+    Parameters:
+    query (str): Words that must all appear in the description. With raw=True
+                 the query is passed to FTS5 as is (phrases, prefix*, OR, NEAR, ...).
+    limit (int): Maximum number of tasks returned.
+
+    Returns:
+    list: Matching (task_id, user_id, description, due_date, status) tuples.
+          In a sharded database each shard ranks its own matches.
+    """
+    if not raw:
+        query = ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+    if not query:
+        return []
+    try:
+        with get_connection() as conn:
+            # Each shard has its own full-text index; take the best of each and merge them by rank
+            shards = " UNION ALL ".join(
+                f"""SELECT * FROM (SELECT Tasks.*, TasksFTS.rank AS rank
+                                   FROM {schema}.TasksFTS JOIN {schema}.Tasks ON Tasks.task_id = TasksFTS.rowid
+                                   WHERE TasksFTS MATCH ? ORDER BY rank LIMIT ?)"""
+                for schema in _schemas(conn)
+            )
+            cursor = conn.execute(
+                f"SELECT task_id, user_id, description, due_date, status FROM ({shards}) ORDER BY rank LIMIT ?",
+                (query, limit) * len(_schemas(conn)) + (limit,)
+            )
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _report_error(f"Error searching tasks: {e}")
+        return []
+
+# ====================== Tags ======================
+
+@_retry_busy
+def create_tag(name):
+    """
+    Create a new tag in the Tags table.
+
+    Parameters:
+    name (str): The name of the tag to be created.
+
+    Returns:
+    int: The ID of the new tag, or None on error.
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute("INSERT INTO Tags (name) VALUES (?)", (name,))
+            return cursor.lastrowid
+    except sqlite3.Error as e:
+        _report_error(f"Error creating tag: {e}")
+        return None
+
+@_retry_busy
+def create_tags_bulk(names):
+    """
+    Insert many tags in a single transaction.
+
+    Parameters:
+    names (iterable): Tag names. May be a generator.
+
+    Returns:
+    int: The number of tags inserted, or 0 on error (nothing is inserted).
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.executemany("INSERT INTO Tags (name) VALUES (?)", ((name,) for name in names))
+            return cursor.rowcount
+    except sqlite3.Error as e:
+        _report_error(f"Error creating tags: {e}")
+        return 0
+
+@_retry_busy
+def read_tags():
     """
     Read all tags from the Tags table.
 
@@ -223,16 +1146,29 @@ def read_tags():
     list: A list of tuples containing tag details.
     """
     try:
-        conn = get_connection()
-        cursor = conn.execute("SELECT * FROM Tags")
-        tags = cursor.fetchall()
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        tags = []
-    finally:
-        conn.close()
-    return tags
+        with get_connection() as conn:
+            cursor = conn.execute("SELECT * FROM Tags")
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _report_error(f"Error reading tags: {e}")
+        return []
 
+def read_tags_page(after_id=0, limit=PAGE_SIZE):
+    """
+    Read the next page of tags whose tag_id is greater than after_id.
+    Pass the tag_id of the last row of a page to get the following one.
+    """
+    return _read_page("Tags", "tag_id", after_id, limit)
+
+
+def iter_tags(page_size=PAGE_SIZE, after_id=0):
+    """
+    Yield tags one at a time in tag_id order, reading page_size rows per query.
+    """
+    return _iter_table("Tags", "tag_id", page_size, after_id)
+
+@_cached("Tags")
+@_retry_busy
 def read_tag(tag_id):
     """
     Retrieve a tag by tag_id from the Tags table.
@@ -248,56 +1184,505 @@ def read_tag(tag_id):
             cursor = conn.execute("SELECT * FROM Tags WHERE tag_id = ?", (tag_id,))
             return cursor.fetchone()
     except sqlite3.Error as e:
-        print(f"Error reading tag: {e}")
+        _report_error(f"Error reading tag: {e}")
         return None
 
+@_retry_busy
 def update_tag(tag_id, name):
     """
     Update a tag in the Tags table based on tag_id."""
-    with get_connection() as conn:
-        conn.execute("UPDATE Tags Set name = ? WHERE tag_id = ?", (name, tag_id))
-        conn.commit()
+    try:
+        with get_connection() as conn:
+            conn.execute("UPDATE Tags Set name = ? WHERE tag_id = ?", (name, tag_id))
+        _invalidate(("Tags", tag_id))
+    except sqlite3.Error as e:
+        _report_error(f"Error updating tag: {e}")
 
+@_retry_busy
 def delete_tag(tag_id):
     """
     Delete a tag from the Tags table based on tag_id."""
-    with get_connection() as conn:
-        conn.execute("DELETE FROM Tags WHERE tag_id = ?", (tag_id,))
-        conn.commit()
+    try:
+        with get_connection() as conn:
+            conn.execute("DELETE FROM Tags WHERE tag_id = ?", (tag_id,))
+        _invalidate(("Tags", tag_id))
+    except sqlite3.IntegrityError as e:
+        _report_error(f"Cannot delete tag due to associated records: {e}")
+    except sqlite3.Error as e:
+        _report_error(f"Error deleting tag: {e}")
 
 # ====================== TaskTags ======================
 
+@_retry_busy
 def create_task_tag_relation(task_id, tag_id):
     """
     Create a relation between a task and a tag in the TaskTags table."""
-    with get_connection() as conn:
-        task = read_task(task_id)[2]
-        tag = read_tag(tag_id)[1]
-        conn.execute("INSERT INTO TaskTags (task_id, tag_id, task, tag) VALUES (?, ?, ?, ?)", (task_id, tag_id, task, tag))
-        conn.commit()
+    try:
+        with get_connection() as conn:
+            conn.execute(f"INSERT INTO {_shard(conn, task_id)}.TaskTags (task_id, tag_id) VALUES (?, ?)", (task_id, tag_id))
+    except sqlite3.IntegrityError as e:
+        _report_error(f"Error: Constraint failed - {e}")
+    except sqlite3.Error as e:
+        _report_error(f"Error creating task tag relation: {e}")
+
+@_retry_busy
+def create_task_tag_relations_bulk(pairs):
+    """
+    Create many task-tag relations in a single transaction.
+
+    Parameters:
+    pairs (iterable): (task_id, tag_id) tuples. May be a generator.
+
+    Returns:
+    int: The number of relations created, or 0 on error (nothing is inserted).
+    """
+    try:
+        with get_connection() as conn:
+            return sum(
+                conn.executemany(f"INSERT INTO {schema}.TaskTags (task_id, tag_id) VALUES (?, ?)", rows).rowcount
+                for schema, rows in _by_shard(conn, pairs, 0).items()
+            )
+    except sqlite3.IntegrityError as e:
+        _report_error(f"Error: Constraint failed - {e}")
+        return 0
+    except sqlite3.Error as e:
+        _report_error(f"Error creating task tag relations: {e}")
+        return 0
+
+@_retry_busy
+def tag_tasks(task_ids, tag_ids):
+    """
+    Tag every task in task_ids with every tag in tag_ids, in one statement.
+    Relations that already exist are left alone.
+
+    Parameters:
+    task_ids (list): IDs of the tasks to tag.
+    tag_ids (list): IDs of the tags to apply.
+
+    Returns:
+    int: The number of relations created, or 0 on error.
+    """
+    try:
+        tag_ids = json.dumps(list(tag_ids))
+        with get_connection() as conn:
+            return sum(
+                conn.execute(
+                    f"""INSERT OR IGNORE INTO {schema}.TaskTags (task_id, tag_id)
+                        SELECT tasks.value, tags.value FROM json_each(?) AS tasks, json_each(?) AS tags""",
+                    (json.dumps([task_id for (task_id,) in rows]), tag_ids)
+                ).rowcount
+                for schema, rows in _by_shard(conn, [(task_id,) for task_id in task_ids], 0).items()
+            )
+    except sqlite3.IntegrityError as e:
+        _report_error(f"Error: Constraint failed - {e}")
+        return 0
+    except sqlite3.Error as e:
+        _report_error(f"Error tagging tasks: {e}")
+        return 0
+
+@_retry_busy
+def untag_tasks(task_ids, tag_ids):
+    """
+    Remove every tag in tag_ids from every task in task_ids, in one statement.
+
+    Returns:
+    int: The number of relations removed, or 0 on error.
+    """
+    try:
+        tag_ids = json.dumps(list(tag_ids))
+        with get_connection() as conn:
+            return sum(
+                conn.execute(
+                    f"""DELETE FROM {schema}.TaskTags
+                        WHERE task_id IN (SELECT value FROM json_each(?))
+                        AND tag_id IN (SELECT value FROM json_each(?))""",
+                    (json.dumps([task_id for (task_id,) in rows]), tag_ids)
+                ).rowcount
+                for schema, rows in _by_shard(conn, [(task_id,) for task_id in task_ids], 0).items()
+            )
+    except sqlite3.Error as e:
+        _report_error(f"Error untagging tasks: {e}")
+        return 0
 
+@_retry_busy
 def read_tags_for_task(task_id):
     """
-    Read all tags associated with a task from the TaskTags table."""
-    with get_connection() as conn:
-        cursor = conn.execute("SELECT * FROM TaskTags WHERE task_id = ?",(task_id,))
-        tags = cursor.fetchall()
-    return [tag[2] for tag in tags]
+    Read the IDs of all tags associated with a task from the TaskTags table."""
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute("SELECT tag_id FROM TaskTags WHERE task_id = ?",(task_id,))
+            return [tag[0] for tag in cursor.fetchall()]
+    except sqlite3.Error as e:
+        _report_error(f"Error reading tags for task: {e}")
+        return []
 
+@_retry_busy
 def read_tasks_for_tag(tag_id):
     """
-    Read all tasks associated with a tag from the TaskTags table."""
+    Read the IDs of all tasks associated with a tag from the TaskTags table."""
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute("SELECT task_id FROM TaskTags WHERE tag_id = ?",(tag_id,))
+            return [task[0] for task in cursor.fetchall()]
+    except sqlite3.Error as e:
+        _report_error(f"Error reading tasks for tag: {e}")
+        return []
+
+@_retry_busy
+def read_tags_details_for_task(task_id):
+    """
+    Read the full Tags rows of every tag associated with a task, in one joined query.
+
+    Returns:
+    list: (tag_id, name) tuples ordered by tag_id.
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute(
+                """SELECT Tags.* FROM TaskTags JOIN Tags ON Tags.tag_id = TaskTags.tag_id
+                   WHERE TaskTags.task_id = ? ORDER BY Tags.tag_id""",
+                (task_id,)
+            )
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _report_error(f"Error reading tags for task: {e}")
+        return []
+
+@_retry_busy
+def read_tasks_details_for_tag(tag_id):
+    """
+    Read the full Tasks rows of every task associated with a tag, in one joined query.
+
+    Returns:
+    list: (task_id, user_id, description, due_date, status) tuples ordered by task_id.
+    """
+    try:
+        with get_connection() as conn:
+            # A task's tags are in its own shard, so join shard by shard
+            shards = " UNION ALL ".join(
+                f"""SELECT Tasks.* FROM {schema}.TaskTags JOIN {schema}.Tasks ON Tasks.task_id = TaskTags.task_id
+                    WHERE TaskTags.tag_id = ?"""
+                for schema in _schemas(conn)
+            )
+            cursor = conn.execute(f"{shards} ORDER BY task_id", (tag_id,) * len(_schemas(conn)))
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _report_error(f"Error reading tasks for tag: {e}")
+        return []
+
+@_retry_busy
+def remove_tag_from_task(task_id, tag_id=None):
+    """
+    Remove a tag from a task in the TaskTags table, or all of the task's tags
+    when tag_id is not given."""
+    try:
+        with get_connection() as conn:
+            schema = _shard(conn, task_id)
+            if tag_id is None:
+                conn.execute(f"DELETE FROM {schema}.TaskTags WHERE task_id = ? ", (task_id,))
+            else:
+                conn.execute(f"DELETE FROM {schema}.TaskTags WHERE task_id = ? AND tag_id = ?", (task_id, tag_id))
+    except sqlite3.Error as e:
+        _report_error(f"Error removing tag from task: {e}")
+
+# ====================== Archive ======================
+
+# Completed tasks archived per transaction by archive_completed_tasks().
+ARCHIVE_BATCH_SIZE = 1000
+
+
+@_retry_busy
+def _archive_batch(schema, before, limit, archived_at):
+    """
+    Move the first `limit` completed tasks due before `before`, and their tag
+    links, from Tasks to the archive tables of schema, in one transaction.
+    They are read from the partial index on completed tasks in due order (named,
+    as the planner would otherwise pick idx_tasks_status for the status term);
+    as archived tasks leave it, each batch starts from its beginning.
+
+    Returns:
+    list: The IDs of the archived tasks.
+    """
     with get_connection() as conn:
-        cursor = conn.execute("SELECT * FROM TaskTags WHERE tag_id = ?",(tag_id,))
-        tasks = cursor.fetchall()
-    return [task[0] for task in tasks]
+        task_ids = [row[0] for row in conn.execute(
+            f"""SELECT task_id FROM {schema}.Tasks INDEXED BY idx_tasks_complete_due
+                WHERE status = 'Complete' AND due_date < ?
+                ORDER BY due_date, task_id LIMIT ?""",
+            (before, limit)
+        )]
+        if task_ids:
+            batch = json.dumps(task_ids)
+            conn.execute(
+                f"""INSERT INTO {schema}.ArchivedTasks (task_id, user_id, description, due_date, status, archived_at)
+                    SELECT task_id, user_id, description, due_date, status, ? FROM {schema}.Tasks
+                    WHERE task_id IN (SELECT value FROM json_each(?))""",
+                (archived_at, batch)
+            )
+            conn.execute(
+                f"""INSERT INTO {schema}.ArchivedTaskTags (task_id, tag_id)
+                    SELECT task_id, tag_id FROM {schema}.TaskTags WHERE task_id IN (SELECT value FROM json_each(?))""",
+                (batch,)
+            )
+            for table in ('TaskTags', 'Tasks'):
+                conn.execute(f"DELETE FROM {schema}.{table} WHERE task_id IN (SELECT value FROM json_each(?))", (batch,))
+        return task_ids
+
 
-def remove_tag_from_task(task_id):
+def archive_completed_tasks(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move completed tasks due before a date, with their tag links, out of Tasks
+    and TaskTags into ArchivedTasks and ArchivedTaskTags, so the live tables and
+    their indexes only hold current work. Tasks carry no completion date, so the
+    due date is what makes a task old; tasks without one are kept.
+
+    Each batch of batch_size tasks is its own transaction, retried on its own
+    when the database is locked, so other writers get the lock in between.
+    Archived tasks drop out of the statistics and search.
+
+    Parameters:
+    before (str): Archive completed tasks due before this date (YYYY-MM-DD).
+    batch_size (int): Tasks moved per transaction.
+
+    Returns:
+    int: The number of tasks archived; after an error, batches already committed stay archived.
+    """
+    archived_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())  # UTC, like CURRENT_TIMESTAMP
+    count = 0
+    try:
+        for schema in _schemas(get_connection()):
+            while True:
+                task_ids = _archive_batch(schema, before, batch_size, archived_at)
+                count += len(task_ids)
+                for task_id in task_ids:
+                    _invalidate(("Tasks", task_id))
+                    _notify_task_listeners('archived', task_id)
+                if len(task_ids) < batch_size:
+                    break
+    except sqlite3.Error as e:
+        _report_error(f"Error archiving tasks: {e}")
+    return count
+
+
+def read_archived_tasks_page(after_id=0, limit=PAGE_SIZE):
+    """
+    Read the next page of archived tasks whose task_id is greater than after_id.
+
+    Returns:
+    list: (task_id, user_id, description, due_date, status, archived_at) tuples.
+    """
+    return _read_page("ArchivedTasks", "task_id", after_id, limit)
+
+
+def iter_archived_tasks(page_size=PAGE_SIZE, after_id=0):
+    """
+    Yield archived tasks one at a time in task_id order, reading page_size rows per query.
+    """
+    return _iter_table("ArchivedTasks", "task_id", page_size, after_id)
+
+# ====================== Change feed ======================
+
+# Changes deleted per transaction by compact_changes().
+COMPACT_BATCH_SIZE = 10000
+
+
+class ChangeCursorExpired(ValueError):
+    """The changes after a cursor were compacted away; the consumer must read everything again."""
+
+
+def _change_log_schemas(conn):
+    """
+    Return the schemas with a ChangeLog: the catalog, then each shard.
+    """
+    return ['main'] + _schemas(conn) if conn.shards else ['main']
+
+
+@_retry_busy
+def latest_change_cursor():
+    """
+    Return the cursor of the newest change. Take it before a full read of the
+    tables, then follow changes_since() from it, to start mirroring the database.
+
+    Returns:
+    str: The cursor, or None on error.
+    """
+    try:
+        with get_connection() as conn:
+            return '.'.join(str(conn.execute(
+                f"""SELECT MAX(IFNULL((SELECT MAX(seq) FROM {schema}.ChangeLog), 0),
+                               (SELECT seq FROM {schema}.ChangeLogHorizon))"""
+            ).fetchone()[0]) for schema in _change_log_schemas(conn))
+    except sqlite3.Error as e:
+        _report_error(f"Error reading the change log: {e}")
+        return None
+
+
+@_retry_busy
+def changes_since(cursor=None, limit=PAGE_SIZE):
+    """
+    Read the changes made to Users, UserDetails, Tasks, Tags and TaskTags after
+    a cursor, oldest first, for mirroring the data incrementally.
+
+    Each change names a row, not its values: read the row to apply an insert or
+    update. A sharded database keeps one log per file, numbered on its own, so
+    the cursor holds a sequence number per file ('12' unsharded, '12.40.7' with
+    two shards) and the logs are merged by time, to the millisecond.
+
+    Parameters:
+    cursor (str): The cursor returned by the previous call or latest_change_cursor(),
+                  or None to start at the oldest change kept.
+    limit (int): Maximum number of changes returned.
+
+    Returns:
+    tuple: (changes, cursor to pass next), changes being
+           (seq, table_name, op, row_id, related_id, changed_at) tuples with op
+           'insert', 'update' or 'delete', row_id the row's ID (task_id for TaskTags)
+           and related_id the tag_id of TaskTags rows, else None.
+
+    Raises:
+    ValueError: If the cursor is malformed.
+    ChangeCursorExpired: A ValueError, if the cursor is older than the last
+                         compaction; read the tables in full again.
+    """
+    try:
+        with get_connection() as conn:
+            schemas = _change_log_schemas(conn)
+            seqs = [None] * len(schemas) if cursor is None else _parse_change_cursor(cursor, len(schemas))
+            logs = []
+            for index, (schema, after) in enumerate(zip(schemas, seqs)):
+                horizon = conn.execute(f"SELECT seq FROM {schema}.ChangeLogHorizon").fetchone()[0]
+                if after is None:
+                    seqs[index] = after = horizon
+                elif after < horizon:
+                    raise ChangeCursorExpired(f"Change cursor {cursor} is older than the compacted change log")
+                logs.append([(changed_at, index, change) for (*change, changed_at) in conn.execute(
+                    f"""SELECT seq, table_name, op, row_id, related_id, changed_at FROM {schema}.ChangeLog
+                        WHERE seq > ? ORDER BY seq LIMIT ?""", (after, limit)
+                )])
+    except sqlite3.Error as e:
+        _report_error(f"Error reading the change log: {e}")
+        return [], cursor
+    changes = []
+    # Each log stays in sequence order, so every file's cursor only moves past changes returned
+    for changed_at, index, change in itertools.islice(heapq.merge(*logs, key=lambda entry: entry[0]), limit):
+        seqs[index] = change[0]
+        changes.append((*change, changed_at))
+    return changes, '.'.join(map(str, seqs))
+
+
+def _parse_change_cursor(cursor, count):
+    try:
+        seqs = [int(part) for part in str(cursor).split('.')]
+    except ValueError:
+        seqs = []
+    if len(seqs) != count:
+        raise ValueError(f"Invalid change cursor {cursor!r}")
+    return seqs
+
+
+@_retry_busy
+def _compact_batch(schema, through, limit):
+    """
+    Delete up to `limit` of the oldest changes of schema, up to sequence number
+    `through`, in one transaction.
+
+    Returns:
+    int: The number of changes deleted.
     """
-    Remove all tags associated with a task in the TaskTags table."""
     with get_connection() as conn:
-        conn.execute("DELETE FROM TaskTags WHERE task_id = ? ", (task_id,))
-        conn.commit()
+        return conn.execute(
+            f"""DELETE FROM {schema}.ChangeLog WHERE seq IN
+                (SELECT seq FROM {schema}.ChangeLog WHERE seq <= ? ORDER BY seq LIMIT ?)""",
+            (through, limit)
+        ).rowcount
+
+
+def compact_changes(before, batch_size=COMPACT_BATCH_SIZE):
+    """
+    Delete the changes recorded before a time, so the change log stays as long
+    as the window consumers need. Consumers whose cursor is older must read the
+    tables in full again; changes_since() tells them so.
+
+    The horizon is moved first and each batch commits on its own, so compaction
+    can run next to writers and readers.
 
+    Parameters:
+    before (str): UTC time 'YYYY-MM-DD HH:MM:SS'; older changes are deleted.
+    batch_size (int): Changes deleted per transaction.
 
-    
\ No newline at end of file
+    Returns:
+    int: The number of changes deleted.
+    """
+    count = 0
+    try:
+        with get_connection() as conn:
+            schemas = _change_log_schemas(conn)
+        for schema in schemas:
+            with get_connection() as conn:
+                # The log is in time order, so the oldest kept change is the first one at or after `before`
+                through = conn.execute(
+                    f"""SELECT IFNULL((SELECT seq - 1 FROM {schema}.ChangeLog WHERE changed_at >= ? ORDER BY seq LIMIT 1),
+                                      (SELECT MAX(seq) FROM {schema}.ChangeLog))""",
+                    (before,)
+                ).fetchone()[0]
+                if through is None:
+                    continue
+                conn.execute(f"UPDATE {schema}.ChangeLogHorizon SET seq = MAX(seq, ?)", (through,))
+            while True:
+                deleted = _compact_batch(schema, through, batch_size)
+                count += deleted
+                if deleted < batch_size:
+                    break
+    except sqlite3.Error as e:
+        _report_error(f"Error compacting the change log: {e}")
+    return count
+
+# ====================== Statistics ======================
+
+@_retry_busy
+def task_stats(user_id=None, today=None):
+    """
+    Read task counts from the counter tables kept up to date by triggers, so the
+    cost does not grow with the number of tasks. Overdue tasks are summed over the
+    open task count of each due date before today.
+
+    Parameters:
+    user_id (int): Also return the task counts of this user.
+    today (str): Date (YYYY-MM-DD) overdue is measured against; defaults to today.
+
+    Returns:
+    dict: {'total', 'open', 'overdue', 'by_status': {status: count}, 'by_tag': {tag_id: count}},
+          plus 'user': {'tasks', 'open'} when user_id is given.
+    """
+    if today is None:
+        today = date.today().isoformat()
+    try:
+        with get_connection() as conn:
+            # Counter rows are summed per key, as a sharded database has one per shard
+            by_status = {
+                status or None: count for status, count in conn.execute(
+                    """SELECT status, SUM(task_count) FROM TaskStatusCounts GROUP BY status
+                       HAVING SUM(task_count) > 0 ORDER BY status""")
+            }
+            by_tag = dict(conn.execute(
+                """SELECT tag_id, SUM(task_count) FROM TagTaskCounts GROUP BY tag_id
+                   HAVING SUM(task_count) > 0 ORDER BY tag_id"""))
+            overdue = conn.execute(
+                "SELECT IFNULL(SUM(task_count), 0) FROM OpenTaskDueCounts WHERE due_date < ?", (today,)
+            ).fetchone()[0]
+            stats = {
+                'total': sum(by_status.values()),
+                'open': sum(count for status, count in by_status.items() if status != 'Complete'),
+                'overdue': overdue,
+                'by_status': by_status,
+                'by_tag': by_tag,
+            }
+            if user_id is not None:
+                row = conn.execute(
+                    "SELECT IFNULL(SUM(task_count), 0), IFNULL(SUM(open_count), 0) FROM UserTaskCounts WHERE user_id = ?",
+                    (user_id,)
+                ).fetchone()
+                stats['user'] = {'tasks': row[0], 'open': row[1]}
+            return stats
+    except sqlite3.Error as e:
+        _report_error(f"Error reading task statistics: {e}")
+        return {}
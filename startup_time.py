@@ -0,0 +1,51 @@
+"""
+Measure how long `python main.py` takes to reach the main menu, to catch start-up regressions.
+
+Usage:
+    python startup_time.py [--runs 10] [--budget-ms 1000]
+
+Each run starts a fresh interpreter with `main.py --startup-time`, which skips the
+intro and exits once the menu would be shown. Exits with status 1 when the median
+wall-clock time is over the budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure(runs):
+    """
+    Return the wall-clock start-up time of each run, in milliseconds.
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, 'main.py'), '--startup-time'],
+            check=True, stdout=subprocess.DEVNULL,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure TaskForce141 start-up time.")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=1000.0)
+    args = parser.parse_args(argv)
+
+    timings = measure(args.runs)
+    median = statistics.median(timings)
+    print(f"Start-up over {args.runs} runs: median {median:.1f} ms, "
+          f"min {min(timings):.1f} ms, max {max(timings):.1f} ms (budget {args.budget_ms:.0f} ms)")
+    return 0 if median <= args.budget_ms else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
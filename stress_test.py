@@ -0,0 +1,165 @@
+"""
+Run many reader and writer processes against one database at once and report
+their throughput, latency and error rates.
+
+Usage:
+    python stress_test.py --writers 8 --readers 8 --seconds 20
+    python stress_test.py --no-retry --busy-timeout 0     # see what contention does without them
+    python stress_test.py --writers 8 --readers 0 --shards 4   # writers spread over 4 shard files
+
+Each process uses sql.py the way main.py does, with its own connection. The
+database is a fresh copy in a temporary directory, seeded with --tasks tasks,
+so todo_list.db is never touched. Exits with status 1 if any call failed.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import create_db
+import sql
+from generate_data import generate
+
+
+def _write(rng, max_user, task_ids, max_tag):
+    operation = rng.choice(('create_task', 'update_task', 'mark_task_as_complete', 'tag_tasks', 'create_user'))
+    if operation == 'create_task':
+        sql.create_task(rng.randint(1, max_user), "stress task", "2030-01-01", "Open")
+    elif operation == 'update_task':
+        sql.update_task(rng.randint(1, max_user), "stress update", "2030-06-01", "In Progress", rng.choice(task_ids))
+    elif operation == 'mark_task_as_complete':
+        sql.mark_task_as_complete(rng.choice(task_ids))
+    elif operation == 'tag_tasks':
+        sql.tag_tasks([rng.choice(task_ids) for _ in range(5)], [rng.randint(1, max_tag)])
+    else:
+        sql.create_user("Stress", "stress@tf141.mil")
+
+
+def _read(rng, max_user, task_ids, max_tag):
+    operation = rng.choice(('read_task', 'query_tasks', 'search_tasks', 'task_stats', 'read_tasks_page'))
+    if operation == 'read_task':
+        sql.read_task(rng.choice(task_ids))
+    elif operation == 'query_tasks':
+        sql.query_tasks(user_id=rng.randint(1, max_user), status='Open', limit=50)
+    elif operation == 'search_tasks':
+        sql.search_tasks(rng.choice(('soap', 'convoy', 'radio')))
+    elif operation == 'task_stats':
+        sql.task_stats()
+    else:
+        sql.read_tasks_page(rng.choice(task_ids) - 1, 100)
+
+
+def worker(role, seed, db_path, start_at, seconds, busy_timeout, retries, ids):
+    """
+    Call sql.py read or write functions in a loop for `seconds` seconds.
+
+    Returns:
+    dict: Counts of successful calls, lock errors and other errors, and call latencies in ms.
+    """
+    sql.configure(db_path, busy_timeout=busy_timeout)
+    sql.configure_cache(maxsize=0)  # other processes write too, so cached rows would go stale
+    sql.RETRIES = retries
+    rng = random.Random(seed)
+    operation = _write if role == 'writer' else _read
+    result = {'role': role, 'ok': 0, 'busy': 0, 'failed': 0, 'latencies': []}
+    sql.get_connection()
+    time.sleep(max(0.0, start_at - time.time()))  # start every process together
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            with sql.raise_errors():
+                operation(rng, *ids)
+            result['ok'] += 1
+        except sqlite3.Error as e:
+            result['busy' if sql._is_busy(e) else 'failed'] += 1
+        result['latencies'].append((time.perf_counter() - start) * 1000)
+    sql.close_all_connections()
+    return result
+
+
+def report(results, seconds):
+    """
+    Print throughput, latency and error rate per role and overall.
+
+    Returns:
+    int: The number of failed calls.
+    """
+    print(f"{'role':8} {'procs':>5} {'calls':>8} {'calls/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'locked':>7} {'other':>6} {'error %':>8}")
+    for role in ('writer', 'reader', 'all'):
+        group = [r for r in results if role in ('all', r['role'])]
+        if not group:
+            continue
+        calls = sum(r['ok'] + r['busy'] + r['failed'] for r in group)
+        busy = sum(r['busy'] for r in group)
+        failed = sum(r['failed'] for r in group)
+        latencies = sorted(ms for r in group for ms in r['latencies'])
+        p50 = statistics.median(latencies) if latencies else 0
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0
+        rate = (busy + failed) / calls * 100 if calls else 0
+        print(f"{role:8} {len(group):5} {calls:8} {calls / seconds:9.0f} {p50:8.2f} {p99:8.2f} "
+              f"{busy:7} {failed:6} {rate:8.2f}")
+    return sum(r['busy'] + r['failed'] for r in results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress sql.py with concurrent processes.")
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--tasks', type=int, default=10_000, help="tasks to seed the database with")
+    parser.add_argument('--busy-timeout', type=int, default=sql.PRAGMAS['busy_timeout'],
+                        help="ms SQLite waits for a lock (PRAGMA busy_timeout)")
+    parser.add_argument('--no-retry', action='store_true', help="do not retry calls that hit a locked database")
+    parser.add_argument('--shards', type=int, help="split the database into this many shard files")
+    parser.add_argument('--seed', type=int, default=141)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stress.db')
+        if args.shards:
+            create_db.shard_database(db_path, args.shards)
+        sql.configure(db_path, synchronous='OFF')
+        generate(args.tasks, args.seed, report=None)
+        conn = sql.get_connection()
+        max_user, max_tag = (conn.execute(f"SELECT MAX({key}) FROM {table}").fetchone()[0]
+                             for table, key in (('Users', 'user_id'), ('Tags', 'tag_id')))
+        # Shard k numbers its tasks k + N, k + 2N, ..., so every ID from N up to
+        # the lowest shard's highest ID exists
+        shards = conn.shards or 1
+        max_task = conn.execute(
+            f"SELECT MIN(top) FROM (SELECT MAX(task_id) AS top FROM Tasks GROUP BY task_id % {shards})"
+        ).fetchone()[0]
+        ids = (max_user, range(shards, max_task + 1), max_tag)
+        sql.close_all_connections()  # connections must not be shared with child processes
+
+        retries = 0 if args.no_retry else sql.RETRIES
+        start_at = time.time() + 1.0
+        jobs = ([('writer', args.seed + n) for n in range(args.writers)]
+                + [('reader', args.seed + 1000 + n) for n in range(args.readers)])
+        print(f"{args.writers} writer(s) and {args.readers} reader(s) for {args.seconds:g}s, "
+              f"busy_timeout {args.busy_timeout} ms, {retries} retries, {args.shards or 'no'} shards")
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(len(jobs)) as pool:
+            results = pool.starmap(worker, [
+                (role, seed, db_path, start_at, args.seconds, args.busy_timeout, retries, ids)
+                for role, seed in jobs
+            ])
+        errors = report(results, args.seconds)
+
+        sql.configure(db_path)
+        check = sql.get_connection().execute("PRAGMA integrity_check").fetchone()[0]  # checks attached shards too
+        sql.close_all_connections()
+        print(f"integrity_check: {check}")
+    return 1 if errors or check != 'ok' else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Regression tests for cli.py; run with python -m unittest.
+"""
+
+import io
+import os
+import tempfile
+import unittest
+
+import cli
+import sql
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        sql.configure(os.path.join(self.tmp.name, 'test.db'))
+
+    def tearDown(self):
+        sql.close_all_connections()
+        sql.clear_cache()
+        self.tmp.cleanup()
+
+    def test_malformed_line_fails_on_its_own(self):
+        lines = [
+            'users create --name Price --email price@tf141.mil',
+            'users create --name "oops --email c',
+            'users create --name Soap --email soap@tf141.mil',
+        ]
+        out, err = io.StringIO(), io.StringIO()
+        run, failed = cli.run_batch(cli.build_parser(), lines, out=out, err=err)
+        self.assertEqual((run, failed), (3, 1))
+        self.assertIn("line 2: error: No closing quotation", err.getvalue())
+        self.assertEqual([user[1] for user in sql.read_users()], ['Price', 'Soap'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Regression tests for write_queue.py; run with python -m unittest.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import sql
+import write_queue
+
+
+class WriteQueueCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        sql.configure(os.path.join(self.tmp.name, 'test.db'))
+        sql.configure_cache(maxsize=4096)
+        user_id = sql.create_user("Price", "price@tf141.mil")
+        self.task_id = sql.create_task(user_id, "Extract Soap", "2030-01-01", "Open")
+
+    def tearDown(self):
+        sql.close_all_connections()
+        sql.clear_cache()
+        self.tmp.cleanup()
+
+    def test_read_during_batch_does_not_cache_the_old_row(self):
+        running, release = threading.Event(), threading.Event()
+
+        def block():
+            running.set()
+            release.wait(5)
+
+        with write_queue.WriteQueue(max_ops=2, max_delay_ms=5000) as queue:
+            queue.mark_task_as_complete(self.task_id)
+            queue.submit(block)
+            self.assertTrue(running.wait(5))
+            # The batch has written the task but not committed it yet
+            self.assertEqual(sql.read_task(self.task_id)[4], 'Open')
+            release.set()
+            queue.flush()
+            self.assertEqual(sql.read_task(self.task_id)[4], 'Complete')
+
+
+class WriteQueueErrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        sql.configure(os.path.join(self.tmp.name, 'test.db'))
+
+    def tearDown(self):
+        sql.close_all_connections()
+        self.tmp.cleanup()
+
+    def test_batch_fails_when_the_transaction_does_not_open(self):
+        failure = sqlite3.OperationalError("unable to open database file")
+        errors = []
+        with mock.patch.object(sql, 'transaction', side_effect=failure):
+            with write_queue.WriteQueue(on_error=lambda operation, error: errors.append(error)) as queue:
+                future = queue.create_user("Price", "price@tf141.mil")
+                with self.assertRaises(sqlite3.OperationalError):
+                    queue.flush(timeout=5)
+                self.assertIs(future.exception(timeout=5), failure)
+        self.assertEqual(errors, [failure, failure])
+
+
+if __name__ == '__main__':
+    unittest.main()
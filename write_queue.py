@@ -0,0 +1,203 @@
+"""
+Group-commit write queue for the sql.py data layer.
+
+    import write_queue
+
+    with write_queue.WriteQueue(max_ops=500, max_delay_ms=20) as queue:
+        future = queue.create_task(1, "Extract Soap", "2025-01-31", "Open")
+        queue.mark_task_as_complete(12)
+        queue.flush()              # everything submitted so far is now committed
+        task_id = future.result()
+
+Writes are handed to one writer thread, which runs them back to back in a
+single transaction and commits once every max_ops operations or max_delay_ms
+milliseconds, whichever comes first. Commits are what cost the most for small
+writes, so sharing one between many operations raises write throughput.
+
+Each operation runs in its own savepoint: a failing operation is rolled back on
+its own and reported through its future (and on_error), and the rest of the
+batch still commits. A future only resolves once its batch is committed, so
+future.result() and flush() are durability barriers.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import sql
+
+# sql.py functions that can be queued by calling them on a WriteQueue, e.g. queue.create_task(...).
+WRITE_FUNCTIONS = {
+    'create_user', 'create_users_bulk', 'update_user', 'delete_user',
+    'create_user_details', 'create_users_details_bulk', 'update_user_details', 'delete_user_details',
+    'create_task', 'create_tasks_bulk', 'update_task', 'delete_task', 'mark_task_as_complete',
+    'create_tag', 'create_tags_bulk', 'update_tag', 'delete_tag',
+    'create_task_tag_relation', 'create_task_tag_relations_bulk', 'tag_tasks', 'untag_tasks',
+    'remove_tag_from_task',
+}
+
+
+class _Operation:
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.submitted = time.monotonic()
+
+
+def _report(operation, error):
+    print(f"Error in queued {getattr(operation.function, '__name__', operation.function)}: {error}")
+
+
+class WriteQueue:
+    """
+    Write-behind queue that commits queued sql.py writes in groups.
+
+    Parameters:
+    max_ops (int): Commit as soon as this many operations are waiting.
+    max_delay_ms (float): Commit operations at the latest this long after they were submitted.
+    max_pending (int): Block submit() while this many operations are waiting, for backpressure.
+    on_error (callable): Called as on_error(operation, exception) for each failed operation;
+                         by default the error is printed. Set to False to only report through futures.
+    """
+
+    def __init__(self, max_ops=500, max_delay_ms=20, max_pending=10_000, on_error=None):
+        self.max_ops = max_ops
+        self.max_delay = max_delay_ms / 1000
+        self.max_pending = max_pending
+        self.on_error = _report if on_error is None else on_error
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='taskforce141-write-queue', daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Queue function(*args, **kwargs) to run on the writer thread.
+
+        Returns:
+        Future: Resolves to the function's return value once its batch is committed,
+                or to the exception it raised.
+        """
+        operation = _Operation(function, args, kwargs)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("WriteQueue is closed")
+            while len(self._pending) >= self.max_pending:
+                self._condition.wait()
+            self._pending.append(operation)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_ops:
+                self._condition.notify_all()
+        return operation.future
+
+    def __getattr__(self, name):
+        if name not in WRITE_FUNCTIONS:
+            raise AttributeError(name)
+
+        def queued(*args, **kwargs):
+            # looked up on each call, so instrumentation such as profiling.enable() applies
+            return self.submit(getattr(sql, name), *args, **kwargs)
+        queued.__name__ = name
+        return queued
+
+    def flush(self, timeout=None):
+        """
+        Commit everything submitted so far and wait until it is committed.
+
+        Returns:
+        bool: False if timeout (in seconds) ran out first.
+        """
+        barrier = self.submit(lambda: None)
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+        try:
+            barrier.result(timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def close(self):
+        """
+        Commit everything still queued and stop the writer thread.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _next_batch(self):
+        """
+        Wait until a batch is due and take it off the queue; None once closed and drained.
+        """
+        with self._condition:
+            while True:
+                if self._pending:
+                    due = self._pending[0].submitted + self.max_delay
+                    if (self._closed or self._flush_requested or len(self._pending) >= self.max_ops
+                            or time.monotonic() >= due):
+                        break
+                    self._condition.wait(due - time.monotonic())
+                elif self._closed:
+                    return None
+                else:
+                    self._condition.wait()
+            # A flush takes everything so that the barrier is in this batch
+            count = len(self._pending) if self._flush_requested or self._closed else self.max_ops
+            batch = [self._pending.popleft() for _ in range(min(count, len(self._pending)))]
+            self._flush_requested = False
+            self._condition.notify_all()  # wake submitters blocked on max_pending
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            self._commit(batch)
+        sql.close_connection()
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with sql.raise_errors(), sql.transaction() as conn:
+                for operation in batch:
+                    if not operation.future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with conn:  # savepoint: a failure only undoes this operation
+                            results.append((operation, operation.function(*operation.args, **operation.kwargs), None))
+                    except Exception as e:
+                        results.append((operation, None, e))
+        except Exception as e:
+            # The transaction failed to open or commit, so nothing in the batch was written
+            errors = {operation: error for operation, _, error in results}
+            for operation in batch:
+                if operation not in errors and not operation.future.set_running_or_notify_cancel():
+                    continue
+                error = errors.get(operation) or e
+                operation.future.set_exception(error)
+                if self.on_error:
+                    self.on_error(operation, error)
+            return
+        # Committed: sql.transaction() has now dropped the lookup cache entries of every
+        # row the batch wrote, so rows other threads read meanwhile are not cached stale
+        for operation, result, error in results:
+            if error is None:
+                operation.future.set_result(result)
+            else:
+                operation.future.set_exception(error)
+                if self.on_error:
+                    self.on_error(operation, error)